@@ -0,0 +1,135 @@
+
+import json
+import numpy as np
+
+from pathlib import Path
+from scipy.spatial import cKDTree
+
+
+
+
+BUSY_LW = 80.0
+LOCAL_LW = 70.0
+_CHUNK = 2 ** 14
+
+
+def street_sources(busy, local, busy_lw=BUSY_LW, local_lw=LOCAL_LW):
+    '''Stack busy and local street points into one source array with the sound power of the road length each point stands for.
+
+    busy and local are the (points, lengths) pairs of get_street_points.
+    busy_lw and local_lw are sound power levels per metre of road (dB/m).
+    '''
+    points, lw = [], []
+    for (pts, lengths), lw_per_m in ((busy, busy_lw), (local, local_lw)):
+        pts = np.asarray(pts, dtype=np.float64).reshape(-1, 3)
+        lengths = np.asarray(lengths, dtype=np.float64).reshape(-1)
+        keep = lengths > 0
+        points.append(pts[keep])
+        lw.append(lw_per_m + 10 * np.log10(lengths[keep]))
+
+    return np.concatenate(points), np.concatenate(lw)
+
+
+def _source_cells(sources, lw, cell):
+    '''Lump the sources into cell x cell x cell boxes, one energetic sum per box at the mean position'''
+    keys = np.floor(sources / cell).astype(np.int64)
+    _, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    counts = np.bincount(inverse)
+
+    centres = np.stack([np.bincount(inverse, sources[:, k]) for k in range(3)], axis=1) / counts[:, None]
+    power = 10 * np.log10(np.bincount(inverse, 10 ** (lw / 10)))
+    return centres, power
+
+
+def _sum_sources(tree, lw, sensors, min_r, max_r, min_dist):
+    '''Energy reaching every sensor from the tree sources between min_r (excluded) and max_r'''
+    pairs = cKDTree(sensors).sparse_distance_matrix(tree, max_r, output_type='ndarray')
+    pairs = pairs[pairs['v'] > min_r] if min_r > 0 else pairs
+    energy = 10 ** ((lw[pairs['j']] - 20 * np.log10(np.maximum(pairs['v'], min_dist)) - 11) / 10)
+    # bincount returns int64 for empty input, even with weights
+    return np.bincount(pairs['i'], energy, minlength=len(sensors)).astype(np.float64)
+
+
+def exposure_levels(sources, lw, sensors, near_dist=100.0, max_dist=500.0, cell=25.0, min_dist=1.0):
+    '''Outdoor level at every sensor, energetically summed over the street sources.
+
+    Each source is a free-field point source, L = Lw - 20 log10(r) - 11. Sources
+    within near_dist of a sensor are summed one by one from a k-d tree query.
+    Sources between near_dist and max_dist are lumped into cells of cell metres,
+    which is accurate to well under 1 dB at that range. Anything beyond max_dist
+    is dropped, and no screening by buildings is applied. Sensors with no source
+    in range get -inf.
+    '''
+    sensors = np.asarray(sensors, dtype=np.float64).reshape(-1, 3)
+    levels = np.full(len(sensors), -np.inf)
+    if len(sources) == 0 or len(sensors) == 0:
+        return levels
+
+    near_tree = cKDTree(sources)
+    centres, power = _source_cells(sources, lw, cell)
+    far_tree = cKDTree(centres)
+
+    for start in range(0, len(sensors), _CHUNK):
+        chunk = sensors[start:start + _CHUNK]
+        energy = _sum_sources(near_tree, lw, chunk, 0, near_dist, min_dist)
+        if max_dist > near_dist:
+            energy += _sum_sources(far_tree, power, chunk, near_dist, max_dist, min_dist)
+        with np.errstate(divide='ignore'):
+            levels[start:start + _CHUNK] = 10 * np.log10(energy)
+
+    return levels
+
+
+def facade_reduction(materials, wwr):
+    '''Composite sound reduction of a facade from the window and wall values of extract_materials_summary_enhanced'''
+    wwr = np.clip(np.asarray(wwr, dtype=np.float64), 0, 1)
+    r_win = float(materials["window_noise_reduction"])
+    r_wall = float(materials["wall_noise_reduction"])
+
+    return -10 * np.log10(wwr * 10 ** (-r_win / 10) + (1 - wwr) * 10 ** (-r_wall / 10))
+
+
+def room_wwr(room):
+    '''Window-to-wall ratio of the outdoor walls of a honeybee Room'''
+    wall_area = room.exterior_wall_area
+    return room.exterior_aperture_area / wall_area if wall_area > 0 else 0.0
+
+
+def get_sound_levels(rooms, point_sets, busy, local, materials,
+                     busy_lw=BUSY_LW, local_lw=LOCAL_LW, near_dist=100.0, max_dist=500.0):
+    '''Indoor Sound_Levels of every room from its facade sensor points and the sampled streets.
+
+    busy and local are the (points, lengths) pairs of get_street_points.
+    Returns the per sensor levels, one list per room, and the energetic mean
+    of every room, both after the facade reduction of that room's
+    window-to-wall ratio and floored at 0 dB.
+    '''
+    sources, lw = street_sources(busy, local, busy_lw, local_lw)
+    point_sets = [np.asarray(pts, dtype=np.float64).reshape(-1, 3) for pts in point_sets]
+    counts = [len(pts) for pts in point_sets]
+    all_points = np.concatenate(point_sets) if point_sets else np.zeros((0, 3))
+
+    outdoor = exposure_levels(sources, lw, all_points, near_dist, max_dist)
+    reduction = np.repeat(facade_reduction(materials, [room_wwr(room) for room in rooms]), counts)
+    indoor = np.maximum(outdoor - reduction, 0)
+
+    room_levels = np.split(indoor, np.cumsum(counts)[:-1])
+    room_means = [float(10 * np.log10(np.mean(10 ** (lv / 10)))) if len(lv) else 0.0 for lv in room_levels]
+
+    return [lv.tolist() for lv in room_levels], room_means
+
+
+def write_sound_levels(results_folder, grid_ids, room_levels):
+    '''Write the per room levels as honeybee-vtk results (grids_info.json and one .res per grid)'''
+    results_folder = Path(results_folder)
+    results_folder.mkdir(parents=True, exist_ok=True)
+
+    grids_info = []
+    for grid_id, levels in zip(grid_ids, room_levels):
+        grids_info.append({"identifier": grid_id, "full_id": grid_id, "count": len(levels)})
+        np.savetxt(results_folder.joinpath(f'{grid_id}.res'), np.asarray(levels), fmt='%.2f')
+
+    results_folder.joinpath('grids_info.json').write_text(json.dumps(grids_info, indent=2))
+
+    return results_folder
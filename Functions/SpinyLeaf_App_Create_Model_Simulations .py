@@ -1,9 +1,16 @@
 
 import os
-
+import math
+import shutil
+import tempfile
+import sqlite3
+import json
+import hashlib
+import numpy as np
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from ladybug.futil import write_to_file
-from ladybug.sql import SQLiteResult
 from ladybug.wea import Wea
 
 from ladybug.viewsphere import view_sphere
@@ -11,14 +18,21 @@ from ladybug.color import Colorset
 from ladybug.graphic import GraphicContainer
 
 
-from ladybug_rhino.fromgeometry import from_point3d, from_vector3d
-from ladybug_rhino.intersect import join_geometry_to_mesh, intersect_mesh_rays, intersect_mesh_lines
+try:
+    from ladybug_rhino.fromgeometry import from_point3d, from_vector3d
+    from ladybug_rhino.intersect import join_geometry_to_mesh, intersect_mesh_rays, intersect_mesh_lines
+except ImportError:  # no RhinoInside, only the numpy view backend is available
+    from_point3d = from_vector3d = None
+    join_geometry_to_mesh = intersect_mesh_rays = intersect_mesh_lines = None
+
+from SpinyLeaf_App_Geometry_Engine import OcclusionBVH, to_array, map_view_studies
 
 
 
 
 from honeybee.aperture import Aperture
 from honeybee.room import Room
+from honeybee.boundarycondition import boundary_conditions, Surface
 from honeybee.typing import clean_and_id_string
 
 
@@ -57,13 +71,32 @@ from honeybee_energy.reader import clean_idf_file_contents
 from honeybee_radiance.sensorgrid import SensorGrid
 
 from lbt_recipes.recipe import Recipe
+from lbt_recipes.settings import RecipeSettings
 import traceback
 
 
+SIM_CACHE_FOLDER = os.path.join(os.path.expanduser('~'), 'SpinyLeaf_App', 'Cache', 'comfort')
+SIM_CACHE_MAX_BYTES = 5 * 1024 ** 3
+COMFORT_OUTPUTS = ('Zone Operative Temperature', 'Zone Air Relative Humidity', 'Zone Air CO2 Concentration')
+OUTPUT_SQL = '''SELECT rd.ReportDataDictionaryIndex, t.Month, rd.Value FROM ReportData rd
+    JOIN ReportDataDictionary rdd ON rd.ReportDataDictionaryIndex = rdd.ReportDataDictionaryIndex
+    JOIN Time t ON rd.TimeIndex = t.TimeIndex
+    WHERE rdd.Name = ? AND (t.WarmupFlag IS NULL OR t.WarmupFlag = 0)
+      AND t.EnvironmentPeriodIndex IN
+          (SELECT EnvironmentPeriodIndex FROM EnvironmentPeriods WHERE EnvironmentType = 3)
+    ORDER BY rd.ReportDataDictionaryIndex, rd.TimeIndex'''
+
 
+@lru_cache(maxsize=None)
+def library_program(identifier):
+    '''Look up a building program from the honeybee library once per identifier'''
+    return building_program_type_by_identifier(identifier)
 
+
+@lru_cache(maxsize=None)
 def create_program(usage, occupants_per_area):
-    '''Create and return programs according to the sample usage'''
+    '''Create and return programs according to the sample usage.
+    Programs are built once per (usage, occupants_per_area), locked and shared between calls'''
     prog = {0 : 'MediumOffice',
             1 : 'Retail',
             2 : 'MidriseApartment',
@@ -94,7 +127,7 @@ def create_program(usage, occupants_per_area):
     map_csb = {office: 25.0, retail: 28.0, resid: 27.0, data_c: 15.0, school: 28.0, hosp: 21.0, lab: 20.5}
     map_inf = {office: 0.0003, retail: 0.0003, resid: 0.0003, data_c: 0.0003, school: 0.0003, hosp: 0.0003, lab: 0.0003}
     
-    program_usage = building_program_type_by_identifier(prog[usage])
+    program_usage = library_program(prog[usage])
 
     try:
         occ_sch = program_usage.people.occupancy_schedule
@@ -168,6 +201,8 @@ def create_program(usage, occupants_per_area):
     p_name = clean_and_id_string(pn) 
     program = ProgramType(p_name, people=ppl, lighting=lgt, electric_equipment=eqp, gas_equipment=gas, service_hot_water=hwt, 
                                             infiltration=inf, ventilation=vent, setpoint=setpt)
+    # shared by every room that asks for this usage, so it must not be edited in place
+    program.lock()
     
     return program
     
@@ -197,7 +232,7 @@ def vent_control(usage, operable):
     map_hsp = {office: 20.0, retail: 20.0, resid: 20.0, data_c: 15.0, school: 20.0, hosp: 21.0, lab: 20.5}
     map_csp = {office: 23.0, retail: 23.0, resid: 24.0, data_c: 15.0, school: 23.0, hosp: 21.0, lab: 20.5}
     
-    program_usage = building_program_type_by_identifier(prog[usage])
+    program_usage = library_program(prog[usage])
     
     if operable == 1:
         min_in_temp = map_hsp[usage] + 1
@@ -215,19 +250,58 @@ def vent_control(usage, operable):
 
 
 
+CONSTRUCTION_SETS = {}
+
+
+@lru_cache(maxsize=None)
+def library_material(identifier):
+    '''Resolve a library opaque material once per identifier'''
+    return opaque_material_by_identifier(identifier)
+
+
+@lru_cache(maxsize=None)
+def library_window(identifier):
+    '''Resolve a library window construction once per identifier'''
+    return window_construction_by_identifier(identifier)
+
+
+def shared_construction_set(key, build, n):
+    '''Return the locked ConstructionSet registered for key, building it with n on first use'''
+    if key not in CONSTRUCTION_SETS:
+        c_set = build(n)
+        c_set.lock()
+        CONSTRUCTION_SETS[key] = c_set
+
+    return CONSTRUCTION_SETS[key]
+
+
 def construction_set(win_u_value, shgc, wall_r, roof_r, ground_r, n):
-    '''Create and return construction sets based on the sample material property values (U values, R values, SHGC)'''
+    '''Create and return construction sets based on the sample material property values (U values, R values, SHGC).
+    Identical values share one locked set, named after the first n they were built with'''
+    key = ('construction_set', win_u_value, shgc, wall_r, roof_r, ground_r)
+    return shared_construction_set(key, lambda name: _new_construction_set(win_u_value, shgc, wall_r, roof_r, ground_r, name), n)
+
+
+def construction_set_op(window, wall_type, wall_r, roof_type, roof_r, ground_type, ground_r, n):
+    '''Create and return construction sets from library materials, shared like construction_set'''
+    key = ('construction_set_op', window, wall_type, wall_r, roof_type, roof_r, ground_type, ground_r)
+    return shared_construction_set(key, lambda name: _new_construction_set_op(
+        window, wall_type, wall_r, roof_type, roof_r, ground_type, ground_r, name), n)
+
+
+
+def _new_construction_set(win_u_value, shgc, wall_r, roof_r, ground_r, n):
 
     wind_con = WindowConstruction(f'Uv_{win_u_value}_SHGC_{shgc}', [EnergyWindowMaterialSimpleGlazSys(f'win_nomass', win_u_value, shgc)])
     
-    wall_mass = opaque_material_by_identifier('4 in. Normalweight Concrete Wall')
+    wall_mass = library_material('4 in. Normalweight Concrete Wall')
     wall_con = OpaqueConstruction(f'wallR_{wall_r}', [wall_mass, EnergyMaterialNoMass(f'wall_nomass', wall_r - (wall_mass.r_value))])
     
-    roof_mass1 = opaque_material_by_identifier('Metal Roofing')
-    roof_mass2 = opaque_material_by_identifier('6 in. Heavyweight Concrete Roof')
+    roof_mass1 = library_material('Metal Roofing')
+    roof_mass2 = library_material('6 in. Heavyweight Concrete Roof')
     roof_con = OpaqueConstruction(f'roofR_{roof_r}', [roof_mass1, roof_mass2, EnergyMaterialNoMass(f'roof_nomass', (roof_r - (roof_mass1.r_value)- (roof_mass2.r_value)))])
     
-    ground_mass = opaque_material_by_identifier('100mm Normalweight concrete floor')
+    ground_mass = library_material('100mm Normalweight concrete floor')
     ground_con = OpaqueConstruction(f'groundR_{ground_r}',[ground_mass, EnergyMaterialNoMass(f'ground_nomass', ground_r - (ground_mass.r_value))])
 
     construction_set_by_identifier
@@ -243,7 +317,7 @@ def construction_set(win_u_value, shgc, wall_r, roof_r, ground_r, n):
 
 
 
-def construction_set_op(window, wall_type, wall_r, roof_type, roof_r, ground_type, ground_r, n):
+def _new_construction_set_op(window, wall_type, wall_r, roof_type, roof_r, ground_type, ground_r, n):
     
     ins_name = { 2: 'Typical Insulation-R11',
                  3: 'Typical Insulation-R17',
@@ -255,32 +329,32 @@ def construction_set_op(window, wall_type, wall_r, roof_type, roof_r, ground_typ
                  9: 'Typical Insulation-R52',
                  10: 'Typical Insulation-R57'}
 
-    wall_ins = opaque_material_by_identifier(ins_name[wall_r])
+    wall_ins = library_material(ins_name[wall_r])
 
     concrete = 'Generic LW Concrete'
     gypsum = 'Gypsum Or Plaster Board - 3/8 in.'
     metal_siding = 'Metal Siding'
 
     if wall_type == 'GRC_Insul_Plasterboard':
-        wall_mass = opaque_material_by_identifier(concrete)
-        wall_finish = opaque_material_by_identifier(gypsum)
+        wall_mass = library_material(concrete)
+        wall_finish = library_material(gypsum)
     
         wall_con = OpaqueConstruction(f'wallR_{wall_r}', [wall_mass, wall_ins, wall_finish])
 
     if wall_type == 'Metal_Insul_GRC':
-        wall_mass = opaque_material_by_identifier(concrete)
-        wall_finish = opaque_material_by_identifier(metal_siding)
+        wall_mass = library_material(concrete)
+        wall_finish = library_material(metal_siding)
     
         wall_con = OpaqueConstruction(f'wallR_{wall_r}', [wall_finish, wall_ins, wall_mass])
     
-    roof_mass1 = opaque_material_by_identifier('Metal Roofing')
-    roof_mass2 = opaque_material_by_identifier('6 in. Heavyweight Concrete Roof')
+    roof_mass1 = library_material('Metal Roofing')
+    roof_mass2 = library_material('6 in. Heavyweight Concrete Roof')
     roof_con = OpaqueConstruction(f'roofR_{roof_r}', [roof_mass1, roof_mass2, EnergyMaterialNoMass(f'roof_nomass', (roof_r - (roof_mass1.r_value)- (roof_mass2.r_value)))])
     
-    ground_mass = opaque_material_by_identifier('100mm Normalweight concrete floor')
+    ground_mass = library_material('100mm Normalweight concrete floor')
     ground_con = OpaqueConstruction(f'groundR_{ground_r}',[ground_mass, EnergyMaterialNoMass(f'ground_nomass', ground_r - (ground_mass.r_value))])
 
-    wind_con = window_construction_by_identifier(window)
+    wind_con = library_window(window)
 
 
     wind_set = ApertureConstructionSet(window_construction=wind_con)
@@ -294,12 +368,21 @@ def construction_set_op(window, wall_type, wall_r, roof_type, roof_r, ground_typ
 
 
 
-def apply_prop(rooms, vent_c, c_set, program, operable, window):
-    '''Apply windows, construction sets and program'''
+ADJACENCY_KEY = 'spinyleaf_adjacency'
+
+
+def apply_prop(rooms, vent_c, c_set, program, operable, window, incremental=False):
+    '''Apply windows, construction sets and program. With incremental=True the adjacency
+    is only re-solved for rooms whose geometry changed since the last incremental call.
+    window=None keeps the window construction of c_set instead of a library window'''
     
     
-    Room.intersect_adjacency(rooms, tolerance=0.01, angle_tolerance=1)
-    Room.solve_adjacency(rooms, 0.01) 
+    if incremental:
+        solve_adjacency_incremental(rooms, tolerance=0.01, angle_tolerance=1)
+    else:
+        Room.intersect_adjacency(rooms, tolerance=0.01, angle_tolerance=1)
+        Room.solve_adjacency(rooms, 0.01) 
+    wind_con = library_window(window) if window is not None else None
     
     for r in rooms:
 
@@ -314,32 +397,153 @@ def apply_prop(rooms, vent_c, c_set, program, operable, window):
         for ap in r.apertures:
             
             ap.is_operable = operable
-            wind_con = window_construction_by_identifier(window)
-            ap.properties.energy.construction = wind_con
+            if wind_con is not None:
+                ap.properties.energy.construction = wind_con
+
+
 
 
+def room_geometry_key(room):
+    '''Hash the face vertices of a room to tell whether its solved adjacency is still valid'''
+    verts = [tuple(round(c, 4) for c in pt) for face in room.faces for pt in face.vertices]
+    return hashlib.sha1(repr(verts).encode('utf-8')).hexdigest()
+
+
+def solve_adjacency_incremental(rooms, tolerance=0.01, angle_tolerance=1):
+    '''Intersect and solve adjacency only for changed rooms and their bounding-box neighbours.
+
+    The geometry key of every solved room is kept in its user_data, which
+    survives Model.duplicate, so property-only variants skip the solve and
+    the cost stays O(rooms) instead of O(rooms²).
+    '''
+    keys = [room_geometry_key(r) for r in rooms]
+    changed = [i for i, (r, k) in enumerate(zip(rooms, keys))
+               if (r.user_data or {}).get(ADJACENCY_KEY) != k]
+    changed_ids = {rooms[i].identifier for i in changed}
+    room_ids = {r.identifier for r in rooms}
+
+    def is_stale(r, bc):
+        '''A Surface BC is stale when either side changed or its adjacent room was removed'''
+        adj_room = bc.boundary_condition_objects[-1]
+        return r.identifier in changed_ids or adj_room in changed_ids or adj_room not in room_ids
+
+    # rooms anywhere in the model that still point at a changed or removed room
+    stale = [i for i, r in enumerate(rooms) if any(
+        isinstance(face.boundary_condition, Surface) and is_stale(r, face.boundary_condition)
+        for face in r.faces)]
+    if not changed and not stale:
+        return
+
+    mins = np.array([(r.min.x, r.min.y, r.min.z) for r in rooms]) - tolerance
+    maxs = np.array([(r.max.x, r.max.y, r.max.z) for r in rooms]) + tolerance
+    group = set(changed) | set(stale)
+    for i in changed:
+        touching = np.all(mins <= maxs[i], axis=1) & np.all(maxs >= mins[i], axis=1)
+        group.update(np.flatnonzero(touching).tolist())
+    group = sorted(group)
+    group_rooms = [rooms[i] for i in group]
+
+    for r in group_rooms:
+        for face in r.faces:
+            bc = face.boundary_condition
+            if isinstance(bc, Surface) and is_stale(r, bc):
+                for sub_face in face.apertures + face.doors:
+                    sub_face.boundary_condition = boundary_conditions.outdoors
+                face.boundary_condition = boundary_conditions.outdoors
+
+    Room.intersect_adjacency(group_rooms, tolerance=tolerance, angle_tolerance=angle_tolerance)
+    Room.solve_adjacency(group_rooms, tolerance)
+
+    for r in group_rooms:
+        user_data = dict(r.user_data or {})
+        user_data[ADJACENCY_KEY] = room_geometry_key(r)
+        r.user_data = user_data
+
+
+SENSOR_DTYPE = np.dtype([('position', np.float64, 3), ('normal', np.float64, 3), ('room', np.int32)])
+
+
+class SensorArray(object):
+    '''Floor sensors of every room in one structured array (position, normal, room index).
+
+    The view studies read the positions straight from the array. It also acts
+    as a lazy sequence of SensorGrids: each grid is only built, and then kept,
+    when a Radiance recipe iterates or indexes it.
+    '''
+
+    def __init__(self, meshes):
+        self.meshes = meshes
+        counts = [0 if m is None else len(m.faces) for m in meshes]
+        self.offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self.data = np.empty(self.offsets[-1], dtype=SENSOR_DTYPE)
+        self._grids = {}
+
+        for i, mesh in enumerate(meshes):
+            if mesh is None:
+                continue
+            room_data = self.data[self.offsets[i]:self.offsets[i + 1]]
+            room_data['position'] = to_array(mesh.face_centroids)
+            room_data['normal'] = to_array(mesh.face_normals)
+            room_data['room'] = i
+
+    def __len__(self):
+        return len(self.meshes)
+
+    def __getitem__(self, index):
+        return self.grid(index)
+
+    def __iter__(self):
+        return (self.grid(i) for i in range(len(self.meshes)))
+
+    def room_sensors(self, index):
+        return self.data[self.offsets[index]:self.offsets[index + 1]]
+
+    def positions(self):
+        '''(N, 3) sensor positions of every room, as views into the array'''
+        return [self.room_sensors(i)['position'] for i in range(len(self.meshes))]
+
+    def grid(self, index):
+        if index not in self._grids:
+            name = f'grid_{index}'
+            sens_name = clean_and_id_string(name)
+            self._grids[index] = SensorGrid.from_mesh3d(sens_name, self.meshes[index])
+        return self._grids[index]
+
+    @property
+    def grids(self):
+        return [self.grid(i) for i in range(len(self.meshes))]
+
+
+def create_sensor_array(model, dist):
+    '''Generate the floor grid of every room into a single SensorArray'''
+    meshes = [room.generate_grid(dist, y_dim=None, offset=1.2) for room in model.rooms]
+    return SensorArray(meshes)
 
 
 def create_sensors(model, dist):
     
-    rooms = list(model.rooms)
-    grids = []
-    meshes = []
+    sensors = create_sensor_array(model, dist)
+
+    # the SensorArray stands in for the grid list and builds each grid on first use
+    return sensors.meshes, sensors
+
 
-    for idx, room in enumerate(rooms):
+def sensor_points(meshes):
+    '''Study meshes and their (N, 3) sensor positions, read from the SensorArray when given one'''
+    if isinstance(meshes, SensorArray):
+        return meshes.meshes, meshes.positions()
+    return meshes, [to_array(m.face_centroids) for m in meshes]
 
-        r_mesh = room.generate_grid(dist, y_dim=None, offset=1.2)
-        meshes.append(r_mesh)
-        name = f'grid_{idx}'
-        sens_name = clean_and_id_string(name)
-        r_grid = SensorGrid.from_mesh3d(sens_name, r_mesh)
-        grids.append(r_grid)
 
-    return meshes, grids
+def assign_sensor_grids(model, sensors):
+    '''Replace the model sensor grids with the grids of a SensorArray, building them now'''
+    model.properties.radiance.remove_sensor_grids()
+    model.properties.radiance.add_sensor_grids(list(sensors))
 
 
 
-def run_sim_comfort(hb_model, sim_path, epw_file, ddy_file, solar, method, period):
+def write_sim_comfort_idf(hb_model, sim_path, ddy_file, solar, method, period):
+    '''Write the comfort simulation IDF into sim_path and return its path and text'''
 
     solar_dist = {0: 'MinimalShadowing',
                   1: 'FullExterior',
@@ -370,7 +574,131 @@ def run_sim_comfort(hb_model, sim_path, epw_file, ddy_file, solar, method, perio
     idf_path = os.path.join(sim_path, f'model.idf')
 
     write_to_file(idf_path, idf_str, True)
-    run_idf(idf_path, epw_file_path=epw_file, expand_objects=True, silent=True)
+
+    return idf_path, idf_str
+
+
+def run_sim_comfort(hb_model, sim_path, epw_file, ddy_file, solar, method, period,
+                    cache_folder=SIM_CACHE_FOLDER, max_cache_bytes=SIM_CACHE_MAX_BYTES):
+    '''Write the model IDF and run it, reusing a cached eplusout.sql when the IDF and
+    weather files match a previous run. Pass cache_folder=None to always simulate'''
+
+    idf_path, idf_str = write_sim_comfort_idf(hb_model, sim_path, ddy_file, solar, method, period)
+
+    if cache_folder is not None:
+        key = sim_cache_key(idf_str, epw_file, ddy_file)
+        cached_sql = os.path.join(cache_folder, key, 'eplusout.sql')
+        try:
+            os.utime(cached_sql)
+            shutil.copyfile(cached_sql, os.path.join(sim_path, 'eplusout.sql'))
+            return
+        except OSError:
+            pass  # not cached, or evicted by a concurrent run: simulate
+
+    sql, zsz, rdd, html, err = run_idf(idf_path, epw_file_path=epw_file, expand_objects=True, silent=True)
+
+    if cache_folder is not None and sql is not None and os.path.isfile(sql):
+        store_sim_cache(cache_folder, key, sql, max_cache_bytes)
+
+
+def run_variants_comfort(hb_model, variants, sim_root, epw_file, ddy_file, solar, method, period,
+                         workers=4, cache_folder=SIM_CACHE_FOLDER):
+    '''Simulate a list of design variants concurrently and return their read_comf_results in variant order.
+
+    Each variant is a dict with 'usage', 'occupants_per_area' and 'operable'
+    plus the construction_set arguments (win_u_value, shgc, wall_r, roof_r,
+    ground_r) or, when it has 'wall_type', 'window' and the construction_set_op
+    ones. construction_set variants keep the window of their U-value/SHGC set.
+    Every variant gets its own sim_root/variant_<n> (or its 'name') folder and at most workers
+    EnergyPlus runs are in flight at once. Adjacency is solved once on a copy of
+    hb_model and reused by every variant.
+    '''
+    results = [None] * len(variants)
+    base_model = hb_model.duplicate()
+    solve_adjacency_incremental(base_model.rooms, tolerance=0.01, angle_tolerance=1)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for i, var in enumerate(variants):
+            name = var.get('name', f'variant_{i}')
+            if 'wall_type' in var:
+                c_set = construction_set_op(var['window'], var['wall_type'], var['wall_r'], var['roof_type'],
+                                            var['roof_r'], var['ground_type'], var['ground_r'], name)
+                window = var['window']
+            else:
+                c_set = construction_set(var['win_u_value'], var['shgc'], var['wall_r'], var['roof_r'],
+                                         var['ground_r'], name)
+                window = None
+
+            model = base_model.duplicate()
+            program = create_program(var['usage'], var['occupants_per_area'])
+            vent_c = vent_control(var['usage'], var['operable'])
+            apply_prop(model.rooms, vent_c, c_set, program, var['operable'], window, incremental=True)
+
+            sim_path = os.path.join(sim_root, name)
+            future = executor.submit(run_sim_comfort, model, sim_path, epw_file, ddy_file,
+                                     solar, method, period, cache_folder)
+            futures[future] = (i, sim_path)
+
+        for future in as_completed(futures):
+            i, sim_path = futures[future]
+            try:
+                future.result()
+                results[i] = read_comf_results(sim_path)
+            except Exception:
+                traceback.print_exc()
+                results[i] = ([], [], [])
+
+    return results
+
+
+def sim_cache_key(idf_str, epw_file, ddy_file):
+    '''Hash the generated IDF text together with the weather files'''
+    hasher = hashlib.sha256(idf_str.encode('utf-8'))
+    for path in (epw_file, ddy_file):
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 ** 2), b''):
+                hasher.update(block)
+
+    return hasher.hexdigest()
+
+
+def store_sim_cache(cache_folder, key, sql_file, max_bytes=SIM_CACHE_MAX_BYTES):
+    '''Copy a finished eplusout.sql into the cache and evict the least recently used entries'''
+    entry = os.path.join(cache_folder, key)
+    cached_sql = os.path.join(entry, 'eplusout.sql')
+    tmp_sql = None
+    try:
+        os.makedirs(entry, exist_ok=True)
+        fd, tmp_sql = tempfile.mkstemp(suffix='.sql.tmp', dir=entry)
+        os.close(fd)
+        shutil.copyfile(sql_file, tmp_sql)
+        os.replace(tmp_sql, cached_sql)
+    except OSError:
+        # a concurrent run stored the same key or evicted the entry; the cache is best effort
+        if tmp_sql is not None and os.path.exists(tmp_sql):
+            os.remove(tmp_sql)
+        if not os.path.isfile(cached_sql):
+            return
+
+    evict_sim_cache(cache_folder, max_bytes)
+
+
+def evict_sim_cache(cache_folder, max_bytes=SIM_CACHE_MAX_BYTES):
+    '''Remove cached runs, oldest use first, until the cache fits in max_bytes'''
+    entries = []
+    for name in os.listdir(cache_folder):
+        sql = os.path.join(cache_folder, name, 'eplusout.sql')
+        if os.path.isfile(sql):
+            st = os.stat(sql)
+            entries.append((st.st_mtime, st.st_size, os.path.join(cache_folder, name)))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
 
 
 def read_comf_results(res_folder):
@@ -384,31 +712,10 @@ def read_comf_results(res_folder):
     
     try:
 
-        if sql in sf:    
-            res_sql = f"{res_folder}\\eplusout.sql"
-            sql_obj = SQLiteResult(res_sql)
-
-            oper_temp_output = 'Zone Operative Temperature'
-            oper_temp = sql_obj.data_collections_by_output_name(oper_temp_output)
-            rel_humidity_output = 'Zone Air Relative Humidity'
-            rh_out = sql_obj.data_collections_by_output_name(rel_humidity_output)
-            co2_output = 'Zone Air CO2 Concentration'
-            co2_out = sql_obj.data_collections_by_output_name(co2_output)
-
-            for _data in oper_temp:
-                
-                opt_val = list(_data.values)
-                opt_values.append(opt_val)
-
-            for _data in rh_out:
-                
-                rh_val = list(_data.values)
-                rh_values.append(rh_val)
-
-            for _data in co2_out:
-                
-                co2_val = list(_data.values)
-                co2_values.append(co2_val)
+        if sql in sf:
+            for values, output in zip((opt_values, rh_values, co2_values), COMFORT_OUTPUTS):
+                for zone, zone_values in iter_comf_results(res_folder, output):
+                    values.append(zone_values.tolist())
 
     except:
         pass
@@ -416,47 +723,517 @@ def read_comf_results(res_folder):
     return opt_values, rh_values, co2_values
 
 
-def run_da(model, epw_file, out_folder):
+def iter_comf_results(res_folder, output, by='zone', batch=8760):
+    '''Stream one output of eplusout.sql without loading the whole table.
+
+    Yields (zone, values) per zone, or (zone, month, values) per zone and month
+    when by='month', reading batch rows from the SQLite cursor at a time.
+    '''
+    if by not in ('zone', 'month'):
+        raise ValueError(f'Unknown grouping: {by}')
+
+    conn = sqlite3.connect(os.path.join(res_folder, 'eplusout.sql'))
+    try:
+        zone_of = dict(conn.execute(
+            'SELECT ReportDataDictionaryIndex, KeyValue FROM ReportDataDictionary WHERE Name = ?', (output,)))
+        cursor = conn.execute(OUTPUT_SQL, (output,))
+
+        group = None
+        values = []
+        while True:
+            rows = cursor.fetchmany(batch)
+            if not rows:
+                break
+            for key, month, value in rows:
+                row_group = key if by == 'zone' else (key, month)
+                if row_group != group:
+                    if values:
+                        yield _comf_group(zone_of, group, by, values)
+                    group = row_group
+                    values = []
+                values.append(value)
+
+        if values:
+            yield _comf_group(zone_of, group, by, values)
+    finally:
+        conn.close()
+
+
+def _comf_group(zone_of, group, by, values):
+    if by == 'zone':
+        return zone_of[group], np.array(values)
+    return zone_of[group[0]], group[1], np.array(values)
+
+
+def percent_hours_in_band(res_folder, output, low, high):
+    '''Percentage of timesteps per zone with low <= value <= high, computed while streaming'''
+    percents = {}
+    for zone, values in iter_comf_results(res_folder, output):
+        percents[zone] = float(((values >= low) & (values <= high)).mean() * 100)
+
+    return percents
+
+
+def timesteps_per_hour(res_folder, output):
+    '''Reported values per hour of the run period for one output, e.g. 6 for 10 minute timesteps'''
+    conn = sqlite3.connect(os.path.join(res_folder, 'eplusout.sql'))
+    try:
+        key = conn.execute('SELECT MIN(ReportDataDictionaryIndex) FROM ReportDataDictionary WHERE Name = ?',
+                           (output,)).fetchone()[0]
+        rows, hours = conn.execute(
+            '''SELECT COUNT(*), COUNT(DISTINCT (t.Month * 100 + t.Day) * 100 + t.Hour) FROM ReportData rd
+            JOIN Time t ON rd.TimeIndex = t.TimeIndex
+            WHERE rd.ReportDataDictionaryIndex = ? AND (t.WarmupFlag IS NULL OR t.WarmupFlag = 0)
+              AND t.EnvironmentPeriodIndex IN
+                  (SELECT EnvironmentPeriodIndex FROM EnvironmentPeriods WHERE EnvironmentType = 3)''',
+            (key,)).fetchone()
+    finally:
+        conn.close()
+
+    return max(1, round(rows / hours)) if hours else 1
+
+
+def extreme_week_mean(res_folder, output, week_start, week_hours=168):
+    '''Mean value per zone over the extreme week, computed while streaming.
+
+    week_start and week_hours are in hours of the run period. They are scaled
+    by timesteps_per_hour, so sub-hourly outputs average the whole week.
+    '''
+    steps = timesteps_per_hour(res_folder, output)
+    start, stop = week_start * steps, (week_start + week_hours) * steps
+
+    means = {}
+    for zone, values in iter_comf_results(res_folder, output):
+        means[zone] = float(values[start:stop].mean())
+
+    return means
+
+
+def read_comf_arrays(res_folder, dtype=np.float32):
+    '''Read the comfort outputs of eplusout.sql into contiguous (zones, timesteps) arrays.
+
+    Returns the zone identifiers followed by the operative temperature,
+    relative humidity and CO2 arrays, all with rows in the same zone order.
+    Only the weather run period is read, with one data query per output.
+    '''
+    conn = sqlite3.connect(os.path.join(res_folder, 'eplusout.sql'))
+    try:
+        marks = ','.join('?' * len(COMFORT_OUTPUTS))
+        dictionary = conn.execute(
+            f'SELECT ReportDataDictionaryIndex, KeyValue FROM ReportDataDictionary WHERE Name IN ({marks})',
+            COMFORT_OUTPUTS).fetchall()
+        zone_of = dict(dictionary)
+
+        zones = None
+        arrays = []
+        for output in COMFORT_OUTPUTS:
+            keys, values = _query_output(conn, output, dtype)
+            if zones is None:
+                zones = np.array([zone_of[k] for k in keys])
+            else:
+                row_of = {zone_of[k]: i for i, k in enumerate(keys)}
+                values = values[[row_of[z] for z in zones]] if len(keys) else values
+            arrays.append(values)
+    finally:
+        conn.close()
+
+    return (zones,) + tuple(arrays)
+
+
+def _query_output(conn, output, dtype):
+    '''Fetch every run period value of one output as a (keys, (zones, timesteps) array) pair'''
+    cursor = conn.execute(OUTPUT_SQL, (output,))
+    rows = np.fromiter(cursor, dtype=[('key', np.int64), ('month', np.int64), ('value', np.float64)])
+
+    keys, counts = np.unique(rows['key'], return_counts=True)
+    if len(keys) == 0:
+        return keys, np.zeros((0, 0), dtype=dtype)
+    if (counts != counts[0]).any():
+        raise ValueError(f'{output} has a different number of timesteps per zone')
+
+    return keys, rows['value'].astype(dtype).reshape(len(keys), counts[0])
+
+
+def run_da(model, epw_file, out_folder, workers=None, sensors=None):
     
     wea = Wea.from_epw_file(epw_file, timestep=1)
-    recipe = Recipe('annual-daylight')
-    recipe.default_project_folder = out_folder
-    recipe.input_value_by_name('model', model)
-    recipe.input_value_by_name('wea', wea)
-    recipe.input_value_by_name('north', 0)
-    recipe.run()
+    return run_recipe('annual-daylight', model, wea, out_folder, {'north': 0}, workers, sensors=sensors)
 
-def run_glare(model, epw_file, out_folder):
+def run_glare(model, epw_file, out_folder, workers=None, sensors=None):
     
     wea = Wea.from_epw_file(epw_file, timestep=1)
-    recipe = Recipe('imageless-annual-glare')
+    return run_recipe('imageless-annual-glare', model, wea, out_folder, None, workers, sensors=sensors)
+
+
+def run_daylight_glare(model, epw_file, da_folder, glare_folder, workers=2, recipe_workers=None, sensors=None):
+    '''Run annual-daylight and imageless-annual-glare concurrently from one parsed weather file.
+
+    The EPW is parsed once and written to a single .wea that both recipes read.
+    The sky matrix itself is still generated inside each recipe. workers sets
+    how many recipes run at once and recipe_workers the CPUs each one uses.
+    Returns the daylight and glare project folders.
+    '''
+    if sensors is not None:
+        assign_sensor_grids(model, sensors)
+    wea = Wea.from_epw_file(epw_file, timestep=1)
+    os.makedirs(da_folder, exist_ok=True)
+    wea_file = wea.write(os.path.join(da_folder, 'weather.wea'))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        da = executor.submit(run_recipe, 'annual-daylight', model, wea_file, da_folder,
+                             {'north': 0}, recipe_workers, wea)
+        glare = executor.submit(run_recipe, 'imageless-annual-glare', model, wea_file, glare_folder,
+                                None, recipe_workers, wea)
+        return da.result(), glare.result()
+
+
+def run_recipe(recipe_name, model, wea, out_folder, inputs=None, workers=None, wea_obj=None, sensors=None):
+    '''Run a Radiance recipe unless out_folder already holds a run of the same model and wea.
+
+    wea is a Wea or a .wea file path; pass the parsed Wea as wea_obj when
+    giving a path so the hash does not need to re-read it. With workers set,
+    the sensor grids are split into balanced chunks for that many workers and
+    the results are merged back into one file per room grid afterwards.
+    sensors is an optional SensorArray whose grids replace the model's ones.
+    '''
+    if sensors is not None:
+        assign_sensor_grids(model, sensors)
+
+    plan = None
+    if workers:
+        chunks, plan = partition_sensor_grids(model.properties.radiance.sensor_grids, workers)
+        model = model.duplicate()
+        model.properties.radiance.remove_sensor_grids()
+        model.properties.radiance.add_sensor_grids(chunks)
+
+    wea_obj = wea_obj if wea_obj is not None else wea
+    key = recipe_hash(recipe_name, model, wea_obj, inputs)
+    marker = os.path.join(out_folder, f'{recipe_name}.hash')
+
+    if os.path.isfile(marker):
+        with open(marker) as f:
+            previous = json.load(f)
+        if previous['hash'] == key and os.path.isdir(previous['project_folder']):
+            return previous['project_folder']
+
+    recipe = Recipe(recipe_name)
     recipe.default_project_folder = out_folder
     recipe.input_value_by_name('model', model)
     recipe.input_value_by_name('wea', wea)
-    recipe.run()
+    for name, value in (inputs or {}).items():
+        recipe.input_value_by_name(name, value)
+
+    project_folder = recipe.run(settings=RecipeSettings(workers=workers))
+    if plan is not None:
+        merge_partitioned_results(project_folder, plan)
+
+    os.makedirs(out_folder, exist_ok=True)
+    with open(marker, 'w') as f:
+        json.dump({'hash': key, 'project_folder': project_folder}, f)
+
+    return project_folder
+
+
+def partition_sensor_grids(grids, workers):
+    '''Split sensor grids so no chunk holds more than an even share of the sensors per worker.
+
+    Returns the chunk grids and a merge plan of (grid identifier, chunk
+    identifiers) pairs in the original grid order.
+    '''
+    total = sum(len(g.sensors) for g in grids)
+    target = max(1, math.ceil(total / workers))
+    chunks = []
+    plan = []
+
+    for grid in grids:
+        sensors = grid.sensors
+        if len(sensors) <= target:
+            chunks.append(grid)
+            plan.append((grid.identifier, [grid.identifier]))
+            continue
+
+        chunk_ids = []
+        parts = np.array_split(np.arange(len(sensors)), math.ceil(len(sensors) / target))
+        for k, part in enumerate(parts):
+            chunk_id = f'{grid.identifier}_part{k}'
+            chunks.append(SensorGrid(chunk_id, [sensors[i].duplicate() for i in part]))
+            chunk_ids.append(chunk_id)
+        plan.append((grid.identifier, chunk_ids))
+
+    return chunks, plan
+
+
+def merge_partitioned_results(results_folder, plan):
+    '''Join the result files of split grids back into one file per room grid, in sensor order.
+
+    The chunk files are deleted once merged and every grids_info.json is
+    rewritten with the room grid identifiers and summed sensor counts.
+    '''
+    split = [(grid_id, chunk_ids) for grid_id, chunk_ids in plan if chunk_ids != [grid_id]]
+    if not split:
+        return
+
+    for root, dirs, files in os.walk(results_folder):
+        names = set(files)
+        for grid_id, chunk_ids in split:
+            exts = {os.path.splitext(f)[1] for f in files if os.path.splitext(f)[0] == chunk_ids[0]}
+            for ext in exts:
+                if not all(c + ext in names for c in chunk_ids):
+                    continue
+                parts = [os.path.join(root, c + ext) for c in chunk_ids]
+                merged = os.path.join(root, grid_id + ext)
+
+                if ext == '.npy':
+                    _merge_npy(parts, merged)
+                else:
+                    with open(merged, 'wb') as out:
+                        for part in parts:
+                            with open(part, 'rb') as f:
+                                data = f.read()
+                            out.write(data if data.endswith(b'\n') or not data else data + b'\n')
+
+                for part in parts:
+                    os.remove(part)
+
+        if 'grids_info.json' in names:
+            _merge_grids_info(os.path.join(root, 'grids_info.json'), split)
+
+
+def _merge_npy(parts, merged):
+    '''Concatenate .npy chunks on the first axis through memory maps, one chunk in RAM at a time'''
+    arrays = [np.load(part, mmap_mode='r') for part in parts]
+    shape = (sum(len(a) for a in arrays),) + arrays[0].shape[1:]
+    out = np.lib.format.open_memmap(merged, mode='w+', dtype=arrays[0].dtype, shape=shape)
+
+    start = 0
+    for a in arrays:
+        out[start:start + len(a)] = a
+        start += len(a)
+    out.flush()
+    del out, arrays
+
+
+def _merge_grids_info(info_file, split):
+    '''Replace the chunk entries of a grids_info.json with one entry per room grid'''
+    with open(info_file) as f:
+        info = json.load(f)
+
+    by_id = {g.get('identifier'): g for g in info}
+    first_chunk = {chunk_ids[0]: (grid_id, chunk_ids) for grid_id, chunk_ids in split}
+    skip = {c for grid_id, chunk_ids in split for c in chunk_ids[1:]}
+
+    merged = []
+    for g in info:
+        ident = g.get('identifier')
+        if ident in skip:
+            continue
+        if ident in first_chunk:
+            grid_id, chunk_ids = first_chunk[ident]
+            chunks = [by_id[c] for c in chunk_ids if c in by_id]
+            g = dict(g)
+            g['identifier'] = grid_id
+            if 'full_id' in g:
+                g['full_id'] = g['full_id'][:len(g['full_id']) - len(ident)] + grid_id
+            if 'count' in g:
+                g['count'] = sum(c.get('count', 0) for c in chunks)
+            if 'end_ln' in g:
+                g['end_ln'] = chunks[-1].get('end_ln', g['end_ln'])
+        merged.append(g)
+
+    with open(info_file, 'w') as f:
+        json.dump(merged, f, indent=4)
+
+
+def _matrix_header(path):
+    '''Read a Radiance matrix header, returning its fields and the byte offset of the data'''
+    header = {}
+    with open(path, 'rb') as f:
+        if not f.readline().startswith(b'#?RADIANCE'):
+            return header, 0
+        for line in iter(f.readline, b''):
+            line = line.strip()
+            if not line:
+                break
+            if b'=' in line:
+                key, value = line.decode('ascii', 'ignore').split('=', 1)
+                header[key.strip()] = value.strip()
+        return header, f.tell()
+
+
+def _to_single_channel(rows, ncomp):
+    if ncomp == 3:
+        rows = rows.reshape(len(rows), -1, 3)
+        return 179 * (0.265 * rows[..., 0] + 0.670 * rows[..., 1] + 0.065 * rows[..., 2])
+    return rows
+
+
+def iter_result_matrix(path, chunk_rows=1024):
+    '''Yield (sensors, hours) blocks of an annual result matrix without loading all of it.
+
+    .npy files and binary Radiance matrices are memory-mapped and sliced;
+    ASCII matrices (with or without a Radiance header) are parsed a block of
+    lines at a time. RGB matrices are reduced to illuminance.
+    '''
+    if path.endswith('.npy'):
+        matrix = np.load(path, mmap_mode='r')
+        for start in range(0, len(matrix), chunk_rows):
+            yield np.asarray(matrix[start:start + chunk_rows], dtype=np.float64)
+        return
+
+    header, offset = _matrix_header(path)
+    ncomp = int(header.get('NCOMP', 1))
+    fmt = header.get('FORMAT', 'ascii')
+
+    if fmt in ('float', 'double'):
+        dtype = np.float32 if fmt == 'float' else np.float64
+        shape = (int(header['NROWS']), int(header['NCOLS']) * ncomp)
+        matrix = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape)
+        for start in range(0, shape[0], chunk_rows):
+            yield _to_single_channel(np.asarray(matrix[start:start + chunk_rows], dtype=np.float64), ncomp)
+        return
+
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        block = []
+        for line in f:
+            if line.strip():
+                block.append(np.array(line.split(), dtype=np.float64))
+            if len(block) == chunk_rows:
+                yield _to_single_channel(np.vstack(block), ncomp)
+                block = []
+        if block:
+            yield _to_single_channel(np.vstack(block), ncomp)
+
+
+def sun_up_hours(path, levels=3):
+    '''Hours of the year of the matrix columns, from the sun-up-hours.txt next to (or above) a result file'''
+    folder = os.path.dirname(os.path.abspath(path))
+    for _ in range(levels + 1):
+        sun_file = os.path.join(folder, 'sun-up-hours.txt')
+        if os.path.isfile(sun_file):
+            return np.loadtxt(sun_file, dtype=np.float64, ndmin=1)
+        folder = os.path.dirname(folder)
+
+    return None
+
+
+def annual_metrics(path, occupied=None, kind='illuminance', da_threshold=300, udi_range=(100, 3000),
+                   glare_threshold=0.4, chunk_rows=1024):
+    '''Per sensor DA and UDI (kind='illuminance') or GA (kind='dgp') in % of occupied hours.
+
+    occupied is an hourly (or per timestep) mask over the whole year, None for
+    every hour. The lbt recipes only write sun-up hours, so the columns are
+    matched to the year through sun-up-hours.txt. Occupied night hours count
+    as failing DA/UDI and as glare free for GA, as in the recipe metrics.
+    Without that file the matrix columns are taken as the year itself.
+    The matrix is reduced chunk by chunk through iter_result_matrix and the
+    metrics are cached in <path>.metrics.npz until the source file changes.
+    '''
+    st = os.stat(path)
+    sun_hours = sun_up_hours(path)
+    occ_key = 'all' if occupied is None else hashlib.sha1(np.asarray(occupied, dtype=bool).tobytes()).hexdigest()
+    sun_key = 'none' if sun_hours is None else hashlib.sha1(sun_hours.tobytes()).hexdigest()
+    key = f'{st.st_mtime_ns}_{st.st_size}_{kind}_{da_threshold}_{udi_range}_{glare_threshold}_{occ_key}_{sun_key}'
+    cache_file = f'{path}.metrics.npz'
+
+    if os.path.isfile(cache_file):
+        cached = np.load(cache_file)
+        if str(cached['key']) == key:
+            return {name: cached[name] for name in cached.files if name != 'key'}
+
+    metrics = {'DA': [], 'UDI': []} if kind == 'illuminance' else {'GA': []}
+    mask = None if occupied is None else np.asarray(occupied, dtype=bool)
+
+    if sun_hours is not None:
+        year = np.ones(8760, dtype=bool) if mask is None else mask
+        steps = max(1, len(year) // 8760)
+        columns = year[np.minimum(np.floor(sun_hours * steps).astype(np.int64), len(year) - 1)]
+        hours = max(int(year.sum()), 1)
+        night = hours - int(columns.sum())
+    else:
+        columns = mask
+        hours = None
+        night = 0
+
+    for block in iter_result_matrix(path, chunk_rows):
+        if columns is not None:
+            block = block[:, columns]
+        total = hours or max(block.shape[1], 1)
+        if kind == 'illuminance':
+            metrics['DA'].append((block >= da_threshold).sum(axis=1) * 100 / total)
+            metrics['UDI'].append(((block >= udi_range[0]) & (block <= udi_range[1])).sum(axis=1) * 100 / total)
+        else:
+            metrics['GA'].append(((block < glare_threshold).sum(axis=1) + night) * 100 / total)
 
+    metrics = {name: np.concatenate(values) if values else np.zeros(0) for name, values in metrics.items()}
+    np.savez(cache_file, key=np.array(key), **metrics)
 
+    return metrics
 
-def get_views_study(meshes, context, building_meshes, study):
 
-    shade_mesh = join_geometry_to_mesh(context + building_meshes)
-    room_matix = []
-    colored_meshes = []
+def recipe_hash(recipe_name, model, wea, inputs=None):
+    '''Hash a recipe run from its name, the model, the wea data and any extra inputs'''
+    if isinstance(wea, Wea):
+        wea_str = wea.to_file_string()
+    else:
+        with open(wea) as f:
+            wea_str = f.read()
+
+    hasher = hashlib.sha256(recipe_name.encode('utf-8'))
+    hasher.update(json.dumps(model.to_dict(), sort_keys=True).encode('utf-8'))
+    hasher.update(wea_str.encode('utf-8'))
+    hasher.update(json.dumps(inputs or {}, sort_keys=True).encode('utf-8'))
+
+    return hasher.hexdigest()
+
+
+
+def get_view_occluder(context, building_meshes):
+    '''Build the numpy backend occlusion index once, to be shared by the Horizontal, Sky and Green studies'''
+    return OcclusionBVH.from_geometries(context + building_meshes)
+
 
-    for study_mesh in meshes:
+def get_views_study(meshes, context, building_meshes, study, backend='rhino', occluder=None, workers=1):
+    '''Run a Horizontal or Sky view study. backend is 'rhino' (RhinoCommon meshes) or
+    'numpy' (ladybug_geometry meshes/faces, no RhinoInside needed), which reuses
+    occluder from get_view_occluder when given and spreads the rooms over a
+    process pool of workers (None for all cores). meshes can be the SensorArray
+    of create_sensor_array, whose positions are then used as they are'''
+
+    meshes, points = sensor_points(meshes)
+    if backend == 'numpy':
+        if occluder is None:
+            occluder = get_view_occluder(context, building_meshes)
         if study == "Horizontal_Views":
             lb_vecs = view_sphere.horizontal_radial_vectors(30 * 1)
         elif study == "Sky_Views":
             patch_mesh, lb_vecs = view_sphere.dome_patches()
+        room_results = map_view_studies(occluder, points, to_array(lb_vecs), kind='rays', workers=workers)
+    elif backend == 'rhino':
+        shade_mesh = join_geometry_to_mesh(context + building_meshes)
+    else:
+        raise ValueError(f'Unknown view study backend: {backend}')
+
+    room_matix = []
+    colored_meshes = []
 
-        view_vecs = [from_vector3d(pt) for pt in lb_vecs]
+    for i, study_mesh in enumerate(meshes):
+        if backend == 'numpy':
+            results = room_results[i]
+        else:
+            if study == "Horizontal_Views":
+                lb_vecs = view_sphere.horizontal_radial_vectors(30 * 1)
+            elif study == "Sky_Views":
+                patch_mesh, lb_vecs = view_sphere.dome_patches()
 
-        points = [from_point3d(pt.move(vec * 0)) for pt, vec in
-                zip(study_mesh.face_centroids, study_mesh.face_normals)]
-        
-        int_matrix, angles = intersect_mesh_rays(shade_mesh, points, view_vecs, cpu_count=None, parallel=False)
-        vec_count = len(view_vecs)
-        results = [sum(int_list) * 100 / vec_count for int_list in int_matrix]
+            view_vecs = [from_vector3d(pt) for pt in lb_vecs]
+
+            points = [from_point3d(pt.move(vec * 0)) for pt, vec in
+                    zip(study_mesh.face_centroids, study_mesh.face_normals)]
+            
+            int_matrix, angles = intersect_mesh_rays(shade_mesh, points, view_vecs, cpu_count=None, parallel=False)
+            vec_count = len(view_vecs)
+            results = [sum(int_list) * 100 / vec_count for int_list in int_matrix]
         room_matix.append(results)
 
         legend_par_ = None
@@ -471,26 +1248,38 @@ def get_views_study(meshes, context, building_meshes, study):
     return room_matix, colored_meshes
 
 
-def get_green_views(meshes, context, building_meshes, green_points):
+def get_green_views(meshes, context, building_meshes, green_points, backend='rhino', occluder=None, workers=1):
+    '''Run the Green view study from every sensor to the green points, see get_views_study for meshes, backend, occluder and workers'''
+
+    meshes, points = sensor_points(meshes)
+    if backend == 'numpy':
+        if occluder is None:
+            occluder = get_view_occluder(context, building_meshes)
+        room_results = map_view_studies(occluder, points, to_array(green_points), kind='lines', workers=workers)
+    elif backend == 'rhino':
+        shade_mesh = join_geometry_to_mesh(context + building_meshes)
+        green_pts = []
+        for pt in green_points:
+            gpt = from_point3d(pt)
+            green_pts.append(gpt)
+    else:
+        raise ValueError(f'Unknown view study backend: {backend}')
 
-    shade_mesh = join_geometry_to_mesh(context + building_meshes)
     room_matix = []
     colored_meshes = []
-    green_pts = []
 
-    for pt in green_points:
-        gpt = from_point3d(pt)
-        green_pts.append(gpt)
+    for i, study_mesh in enumerate(meshes):
 
-    for study_mesh in meshes:
-
-        points = [from_point3d(pt.move(vec * 0)) for pt, vec in
-                zip(study_mesh.face_centroids, study_mesh.face_normals)]
+        if backend == 'numpy':
+            results = room_results[i]
+        else:
+            points = [from_point3d(pt.move(vec * 0)) for pt, vec in
+                    zip(study_mesh.face_centroids, study_mesh.face_normals)]
 
-        int_matrix = intersect_mesh_lines(
-            shade_mesh, points, green_pts, max_dist = None, cpu_count=None, parallel=False)
-        vec_count = len(green_points)
-        results = [sum(int_list) * 100 / vec_count for int_list in int_matrix]
+            int_matrix = intersect_mesh_lines(
+                shade_mesh, points, green_pts, max_dist = None, cpu_count=None, parallel=False)
+            vec_count = len(green_points)
+            results = [sum(int_list) * 100 / vec_count for int_list in int_matrix]
         room_matix.append(results)
 
         legend_par_ = None
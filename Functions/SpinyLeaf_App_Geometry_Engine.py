@@ -0,0 +1,376 @@
+
+import os
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+
+
+
+_CHUNK = 2 ** 21
+_EPS = 1e-9
+_BVH_FIELDS = ('triangles', 'node_min', 'node_max', 'node_left', 'node_right', 'node_start', 'node_count')
+_WORKER_OCCLUDER = None
+
+
+def to_triangles(geometries):
+    '''Flatten ladybug_geometry Mesh3D, Face3D and Polyface3D objects into an (F, 3, 3) triangle array'''
+    tris = []
+
+    for geo in geometries:
+        if hasattr(geo, 'triangulated_mesh3d'):
+            meshes = [geo.triangulated_mesh3d]
+        elif hasattr(geo, 'face_indices'):
+            meshes = [fc.triangulated_mesh3d for fc in geo.faces]
+        else:
+            meshes = [geo]
+
+        for mesh in meshes:
+            verts = np.array([(v.x, v.y, v.z) for v in mesh.vertices], dtype=np.float64)
+            for face in mesh.faces:
+                for i in range(1, len(face) - 1):
+                    tris.append(verts[[face[0], face[i], face[i + 1]]])
+
+    if not tris:
+        return np.zeros((0, 3, 3), dtype=np.float64)
+
+    return np.stack(tris)
+
+
+def to_array(points):
+    '''Convert ladybug_geometry points or vectors into an (N, 3) float array'''
+    return np.array([(pt.x, pt.y, pt.z) for pt in points], dtype=np.float64).reshape(-1, 3)
+
+
+def sample_polyline(vertices, spacing=1.0, lengths=False):
+    '''Sample an (N, 3) polyline at even steps no longer than spacing, both ends included.
+
+    With lengths=True also return the polyline length each point stands for:
+    one step for inner points and half a step for the two ends, summing to
+    the polyline length.
+    '''
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+    if len(vertices) < 2:
+        points = vertices.copy()
+        return (points, np.zeros(len(points))) if lengths else points
+
+    seg = np.linalg.norm(np.diff(vertices, axis=0), axis=1)
+    keep = np.concatenate(([True], seg > 0))
+    vertices = vertices[keep]
+    dist = np.concatenate(([0.0], np.cumsum(seg[seg > 0])))
+    if dist[-1] == 0:
+        points = vertices[:1].copy()
+        return (points, np.zeros(1)) if lengths else points
+
+    n = int(np.ceil(dist[-1] / spacing))
+    steps = np.linspace(0, dist[-1], n + 1)
+    points = np.stack([np.interp(steps, dist, vertices[:, k]) for k in range(3)], axis=1)
+    if not lengths:
+        return points
+
+    weights = np.full(n + 1, dist[-1] / n)
+    weights[[0, -1]] /= 2
+    return points, weights
+
+
+def box_overlaps(min_a, max_a, min_b, max_b, tolerance=0.0):
+    '''(A, B) matrix of which axis-aligned boxes of a touch or overlap boxes of b within tolerance'''
+    min_a, max_a = np.asarray(min_a, dtype=np.float64).reshape(-1, 3), np.asarray(max_a, dtype=np.float64).reshape(-1, 3)
+    min_b, max_b = np.asarray(min_b, dtype=np.float64).reshape(-1, 3), np.asarray(max_b, dtype=np.float64).reshape(-1, 3)
+
+    return ((min_a[:, None] <= max_b[None] + tolerance) &
+            (min_b[None] <= max_a[:, None] + tolerance)).all(axis=2)
+
+
+def bounding_boxes(geometries):
+    '''(N, 3) min and max corners of ladybug_geometry objects'''
+    return to_array([geo.min for geo in geometries]), to_array([geo.max for geo in geometries])
+
+
+def balcony_areas(rooms_geo, balconies_geo, tolerance=0.001):
+    '''Balcony area of every room without RhinoCommon, from ladybug_geometry Polyface3D/Face3D objects.
+
+    A balcony counts for a room when their bounding boxes touch within tolerance.
+    This approximates the Brep intersection of get_balcony_area. It matches for
+    box-like rooms and slab balconies, but it can also count a balcony that only
+    comes near a room's bounding box.
+    '''
+    if not rooms_geo or not balconies_geo:
+        return [0 for _ in rooms_geo]
+
+    r_min, r_max = bounding_boxes(rooms_geo)
+    b_min, b_max = bounding_boxes(balconies_geo)
+    b_area = np.array([geo.area for geo in balconies_geo], dtype=np.float64)
+
+    return (box_overlaps(r_min, r_max, b_min, b_max, tolerance) @ b_area).tolist()
+
+
+def _any_hit(triangles, origins, directions, t_max):
+    '''Batched Möller–Trumbore test returning True for every ray blocked before t_max'''
+    hit = np.zeros(len(origins), dtype=bool)
+    if len(triangles) == 0 or len(origins) == 0:
+        return hit
+
+    v0 = triangles[:, 0]
+    e1 = triangles[:, 1] - v0
+    e2 = triangles[:, 2] - v0
+
+    tri_step = min(len(triangles), _CHUNK)
+    for ts in range(0, len(triangles), tri_step):
+        tv0, te1, te2 = v0[ts:ts + tri_step], e1[ts:ts + tri_step], e2[ts:ts + tri_step]
+        ray_step = max(1, _CHUNK // len(tv0))
+        open_rays = np.flatnonzero(~hit)
+
+        for rs in range(0, len(open_rays), ray_step):
+            idx = open_rays[rs:rs + ray_step]
+            o = origins[idx, None, :]
+            d = directions[idx, None, :]
+
+            p = np.cross(d, te2)
+            det = np.einsum('rfk,fk->rf', p, te1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                inv = 1.0 / det
+                s = o - tv0
+                u = np.einsum('rfk,rfk->rf', s, p) * inv
+                q = np.cross(s, te1)
+                v = np.einsum('rk,rfk->rf', directions[idx], q) * inv
+                t = np.einsum('rfk,fk->rf', q, te2) * inv
+                # rays parallel to a triangle (det == 0) give inf/nan here and are masked out
+                blocked = (np.abs(det) > _EPS) & (u >= 0) & (v >= 0) & (u + v <= 1) & \
+                    (t > _EPS) & (t < t_max[idx, None])
+            hit[idx] |= blocked.any(axis=1)
+
+    return hit
+
+
+class OcclusionBVH(object):
+    '''Bounding-volume hierarchy over occluder triangles for early-exit "any hit" queries.
+
+    Build it once from the context and building geometry and pass it as the
+    occluder to intersect_rays / intersect_lines for every study of a run.
+    '''
+
+    def __init__(self, triangles, leaf_size=64):
+        triangles = np.asarray(triangles, dtype=np.float64).reshape(-1, 3, 3)
+        order, self.node_min, self.node_max, self.node_left, self.node_right, \
+            self.node_start, self.node_count = _build_bvh(triangles, leaf_size)
+        self.triangles = triangles[order]
+
+    @classmethod
+    def from_geometries(cls, geometries, leaf_size=64):
+        '''Build the hierarchy straight from ladybug_geometry meshes/faces'''
+        return cls(to_triangles(geometries), leaf_size)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        '''Rebuild the hierarchy around existing node arrays without copying them'''
+        bvh = cls.__new__(cls)
+        for field in _BVH_FIELDS:
+            setattr(bvh, field, arrays[field])
+        return bvh
+
+    def __len__(self):
+        return len(self.triangles)
+
+    def any_hit(self, origins, directions, t_max):
+        '''Return True for every ray blocked before t_max, skipping rays already blocked'''
+        hit = np.zeros(len(origins), dtype=bool)
+        if len(self.triangles) == 0 or len(origins) == 0:
+            return hit
+
+        safe_d = np.where(np.abs(directions) < 1e-30, 1e-30, directions)
+        inv_d = 1.0 / safe_d
+        stack = [(0, np.arange(len(origins)))]
+
+        while stack:
+            node, idx = stack.pop()
+            idx = idx[~hit[idx]]
+            if len(idx) == 0:
+                continue
+
+            t1 = (self.node_min[node] - origins[idx]) * inv_d[idx]
+            t2 = (self.node_max[node] - origins[idx]) * inv_d[idx]
+            t_near = np.minimum(t1, t2).max(axis=1)
+            t_far = np.maximum(t1, t2).min(axis=1)
+            idx = idx[(t_near <= t_far) & (t_far >= 0) & (t_near <= t_max[idx])]
+            if len(idx) == 0:
+                continue
+
+            if self.node_left[node] < 0:
+                start = self.node_start[node]
+                tris = self.triangles[start:start + self.node_count[node]]
+                hit[idx] = _any_hit(tris, origins[idx], directions[idx], t_max[idx])
+            else:
+                stack.append((self.node_right[node], idx))
+                stack.append((self.node_left[node], idx))
+
+        return hit
+
+
+def _build_bvh(triangles, leaf_size):
+    '''Median-split the triangles on the longest centroid axis into flat node arrays'''
+    tri_min = triangles.min(axis=1) - _EPS
+    tri_max = triangles.max(axis=1) + _EPS
+    centroids = triangles.mean(axis=1)
+    order = np.arange(len(triangles))
+
+    node_min, node_max, node_left, node_right, node_start, node_count = [], [], [], [], [], []
+
+    def add_node(start, end):
+        node_min.append(tri_min[order[start:end]].min(axis=0) if end > start else np.zeros(3))
+        node_max.append(tri_max[order[start:end]].max(axis=0) if end > start else np.zeros(3))
+        node_left.append(-1)
+        node_right.append(-1)
+        node_start.append(start)
+        node_count.append(end - start)
+        return len(node_start) - 1
+
+    stack = [(add_node(0, len(order)), 0, len(order))]
+    while stack:
+        node, start, end = stack.pop()
+        if end - start <= leaf_size:
+            continue
+
+        sub = order[start:end]
+        extent = centroids[sub].max(axis=0) - centroids[sub].min(axis=0)
+        axis = int(np.argmax(extent))
+        mid = (end - start) // 2
+        order[start:end] = sub[np.argpartition(centroids[sub, axis], mid)]
+
+        left = add_node(start, start + mid)
+        right = add_node(start + mid, end)
+        node_left[node] = left
+        node_right[node] = right
+        stack.append((left, start, start + mid))
+        stack.append((right, start + mid, end))
+
+    return (order, np.array(node_min), np.array(node_max), np.array(node_left),
+            np.array(node_right), np.array(node_start), np.array(node_count))
+
+
+def _blocked(occluder, origins, directions, t_max):
+    if isinstance(occluder, OcclusionBVH):
+        return occluder.any_hit(origins, directions, t_max)
+    return _any_hit(occluder, origins, directions, t_max)
+
+
+def intersect_rays(occluder, points, vectors, max_dist=None):
+    '''Intersect every point/vector ray with the occluder triangles or OcclusionBVH.
+
+    Returns a (points, vectors) matrix of 0s and 1s like ladybug_rhino's
+    intersect_mesh_rays, where 1 means the ray was not blocked.
+    '''
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    vectors = np.asarray(vectors, dtype=np.float64).reshape(-1, 3)
+    vectors = vectors / np.linalg.norm(vectors, axis=1)[:, None]
+
+    origins = np.repeat(points, len(vectors), axis=0)
+    directions = np.tile(vectors, (len(points), 1))
+    t_max = np.full(len(origins), np.inf if max_dist is None else max_dist)
+
+    hit = _blocked(occluder, origins, directions, t_max)
+    return (~hit).astype(np.uint8).reshape(len(points), len(vectors))
+
+
+def intersect_lines(occluder, points, targets, max_dist=None):
+    '''Intersect every point/target line with the occluder triangles or OcclusionBVH.
+
+    Returns a (points, targets) matrix of 0s and 1s like ladybug_rhino's
+    intersect_mesh_lines, where 1 means the target is visible from the point.
+    Targets further than max_dist are treated as not visible.
+    '''
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    targets = np.asarray(targets, dtype=np.float64).reshape(-1, 3)
+
+    origins = np.repeat(points, len(targets), axis=0)
+    directions = np.tile(targets, (len(points), 1)) - origins
+    t_max = np.full(len(origins), 1.0 - _EPS)
+
+    hit = _blocked(occluder, origins, directions, t_max)
+    if max_dist is not None:
+        hit |= np.linalg.norm(directions, axis=1) > max_dist
+
+    return (~hit).astype(np.uint8).reshape(len(points), len(targets))
+
+
+class SharedOccluder(object):
+    '''Copy an OcclusionBVH into one shared memory block so pool workers attach to it instead of unpickling it'''
+
+    def __init__(self, bvh):
+        self.layout = []
+        offset = 0
+        for field in _BVH_FIELDS:
+            arr = np.ascontiguousarray(getattr(bvh, field))
+            self.layout.append((field, arr.dtype.str, arr.shape, offset))
+            offset += arr.nbytes
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for field, dtype, shape, start in self.layout:
+            view = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=start)
+            view[...] = getattr(bvh, field)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _attach_occluder(name, layout):
+    '''Pool initializer: map the shared occluder arrays into this worker'''
+    global _WORKER_OCCLUDER
+    shm = shared_memory.SharedMemory(name=name)
+    arrays = {field: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)
+              for field, dtype, shape, start in layout}
+    _WORKER_OCCLUDER = (shm, OcclusionBVH.from_arrays(arrays))
+
+
+def _visible_counts(occluder, kind, points, targets, max_dist):
+    if kind == 'rays':
+        return intersect_rays(occluder, points, targets, max_dist).sum(axis=1)
+    return intersect_lines(occluder, points, targets, max_dist).sum(axis=1)
+
+
+def _view_chunk(args):
+    return _visible_counts(_WORKER_OCCLUDER[1], *args)
+
+
+def map_view_studies(occluder, point_sets, targets, kind='rays', workers=None, max_dist=None):
+    '''Compute the view percentage of every sensor point, one list per room, across a process pool.
+
+    The sensor points of all rooms are split into evenly sized chunks, the
+    occluder is placed in shared memory once, and results come back in the
+    original room order. kind is 'rays' for view vectors or 'lines' for
+    target points. workers=None uses every core, workers=1 runs in process.
+    '''
+    if not isinstance(occluder, OcclusionBVH):
+        occluder = OcclusionBVH(occluder)
+
+    targets = np.asarray(targets, dtype=np.float64).reshape(-1, 3)
+    point_sets = [np.asarray(pts, dtype=np.float64).reshape(-1, 3) for pts in point_sets]
+    counts = [len(pts) for pts in point_sets]
+    all_points = np.concatenate(point_sets) if point_sets else np.zeros((0, 3))
+
+    workers = workers or os.cpu_count() or 1
+    chunks = [c for c in np.array_split(all_points, workers * 4) if len(c)]
+
+    if workers == 1 or len(chunks) <= 1:
+        visible = [_visible_counts(occluder, kind, c, targets, max_dist) for c in chunks]
+    else:
+        with SharedOccluder(occluder) as shared:
+            with ProcessPoolExecutor(workers, initializer=_attach_occluder,
+                                     initargs=(shared.name, shared.layout)) as executor:
+                visible = list(executor.map(_view_chunk, [(kind, c, targets, max_dist) for c in chunks]))
+
+    visible = np.concatenate(visible) if visible else np.zeros(0)
+    percentages = visible * 100 / max(len(targets), 1)
+    return [p.tolist() for p in np.split(percentages, np.cumsum(counts)[:-1])]
@@ -27,7 +27,7 @@ from honeybee.typing import clean_and_id_string
 
 from honeybee.shade import Shade
 
-
+from SpinyLeaf_App_Geometry_Engine import sample_polyline, box_overlaps
 
 
 
@@ -35,7 +35,7 @@ def get_context_shades(context_breps, name, detached):
     shades = []
 
     for br in context_breps:
-        lb_faces = to_face3d(br)
+        lb_faces = brep_faces(br)
 
         for i, fc in enumerate(lb_faces):
             shade_name = clean_and_id_string(name)
@@ -46,21 +46,100 @@ def get_context_shades(context_breps, name, detached):
 
 
 
+USAGES = ('COMMERC', 'RESID', 'SOCIAL', 'CORE')
+_LAYER_INDEXES = {}
+
+
+class LayerIndex(object):
+    '''Layer names of every model object, read in one pass and grouped for the usage queries.
+
+    It also caches the Brep of every object and the Face3Ds of those Breps,
+    so the caches live and die with the model they were read from.
+    '''
+
+    def __init__(self, model, objs):
+        self.model = model
+        self.objs = objs
+        self.count = len(objs)
+        self.layer_names = []
+        self.by_layer = {}
+        self.breps = {}
+        self.faces = {}
+        self._prefixes = {}
+
+        for i, obj in enumerate(objs):
+            layer = model.Layers[obj.Attributes.LayerIndex].Name
+            self.layer_names.append(layer)
+            self.by_layer.setdefault(layer, []).append(i)
+
+    def with_prefix(self, prefix):
+        '''Indices, in object order, of objects whose layer starts with prefix'''
+        if prefix not in self._prefixes:
+            ids = [i for layer, layer_ids in self.by_layer.items() if layer.startswith(prefix) for i in layer_ids]
+            self._prefixes[prefix] = sorted(ids)
+        return self._prefixes[prefix]
+
+    def with_suffix(self, suffix):
+        '''Indices, in object order, of objects whose layer ends with suffix'''
+        ids = [i for layer, layer_ids in self.by_layer.items() if layer.endswith(suffix) for i in layer_ids]
+        return sorted(ids)
+
+    def n_beds(self, i, usages=USAGES):
+        '''Bedroom count of an object on one of the usages layers, None for any other layer'''
+        layer = self.layer_names[i]
+        for usage in usages:
+            if layer.startswith(usage):
+                return int(layer.split('_')[-1]) if usage == 'RESID' else 0
+        return None
+
+    def brep(self, i):
+        '''Brep of object i, converted once'''
+        brep = self.breps.get(i)
+        if brep is None:
+            brep = self.objs[i].Geometry
+            if not isinstance(brep, rg.Brep):
+                brep = brep.ToBrep()
+            self.breps[i] = brep
+            self.faces[id(brep)] = (brep, None)
+
+        return brep
+
+
+def layer_index(model, objs):
+    '''Return the LayerIndex of model objs, scanning them only on the first call for this list'''
+    key = (id(model), id(objs))
+    index = _LAYER_INDEXES.get(key)
+    if index is None or index.model is not model or index.objs is not objs or index.count != len(objs):
+        if len(_LAYER_INDEXES) > 8:
+            _LAYER_INDEXES.clear()
+        index = LayerIndex(model, objs)
+        _LAYER_INDEXES[key] = index
+
+    return index
+
+
+def brep_faces(brep):
+    '''ladybug_geometry Face3Ds of a Brep, kept on the LayerIndex that made the Brep in get_geo'''
+    for index in list(_LAYER_INDEXES.values()):
+        entry = index.faces.get(id(brep))
+        if entry is not None and entry[0] is brep:
+            if entry[1] is None:
+                entry = (brep, to_face3d(brep))
+                index.faces[id(brep)] = entry
+            return entry[1]
+
+    return to_face3d(brep)
+
+
 def get_geo(model, objs, usage):
     usage_geo = []
     selected_objs = []  
 
-    for obj in objs:
-        layer_index = obj.Attributes.LayerIndex
-        layer = model.Layers[layer_index].Name
-
-        if layer.startswith(usage):
-            selected_objs.append(obj)
-            geo = obj.Geometry
-            if not isinstance(geo, rg.Brep):
-                geo = geo.ToBrep()
-            
-            usage_geo.append(geo)
+    index = layer_index(model, objs)
+    for i in index.with_prefix(usage):
+        obj = objs[i]
+        selected_objs.append(obj)
+        usage_geo.append(index.brep(i))
 
     return usage_geo, selected_objs
 
@@ -68,27 +147,11 @@ def get_geo(model, objs, usage):
 def get_n_beds(model, objs, usage):
 
     n_beds = []
-    for obj in objs:
-        layer_index = obj.Attributes.LayerIndex
-        layer = model.Layers[layer_index].Name
-
-        if layer.startswith(usage):
-
-            if layer.startswith('COMMERC'):
-                n_bed = 0
-                n_beds.append(n_bed)
-
-            elif layer.startswith('RESID'):
-                n_bed = int(layer.split('_')[-1])
-                n_beds.append(n_bed)
-
-            elif layer.startswith('SOCIAL'):
-                n_bed = 0
-                n_beds.append(n_bed)
-
-            elif layer.startswith('CORE'):
-                n_bed = 0
-                n_beds.append(n_bed)
+    index = layer_index(model, objs)
+    for i in index.with_prefix(usage):
+        n_bed = index.n_beds(i)
+        if n_bed is not None:
+            n_beds.append(n_bed)
 
     return n_beds
 
@@ -102,47 +165,66 @@ def get_street(model, objs):
     street_pts_local = []
 
 
-    for obj in objs:
-        layer_index = obj.Attributes.LayerIndex
-        layer = model.Layers[layer_index].Name
-
-        if layer.endswith('BUSY'):
-            geo = obj.Geometry.Reparameterize()
-            street_lines_busy.append(geo)
-        elif layer.endswith('LOCAL'):
-            geo = obj.Geometry.Reparameterize()
-            street_lines_local.append(geo)
+    index = layer_index(model, objs)
+    for i in index.with_suffix('BUSY'):
+        geo = objs[i].Geometry.Reparameterize()
+        street_lines_busy.append(geo)
+    for i in index.with_suffix('LOCAL'):
+        geo = objs[i].Geometry.Reparameterize()
+        street_lines_local.append(geo)
 
     for street in street_lines_busy:
-        for i in np.arange(0, 1.1, 0.01):
+        for i in np.linspace(0, 1, 101):
             pt = street.PointAtNormalizedLength(i)
             street_pts_busy.append(pt)
 
     for street in street_lines_local:
-        for i in np.arange(0, 1.1, 0.01):
+        for i in np.linspace(0, 1, 101):
             pt = street.PointAtNormalizedLength(i)
             street_pts_local.append(pt)
 
     return street_pts_busy, street_pts_local
 
 
+def curve_vertices(curve, spacing=1.0):
+    '''(N, 3) vertices of a street curve, exact for polylines, divided at spacing otherwise'''
+    ok, polyline = curve.TryGetPolyline()
+    if ok:
+        pts = list(polyline)
+    else:
+        params = curve.DivideByLength(spacing, True) or []
+        pts = [curve.PointAt(t) for t in params] + [curve.PointAtEnd]
 
-def get_nbeds(model, objs):
-    n_beds = []
-    for obj in objs:
-        layer_index = obj.Attributes.LayerIndex
-        layer = model.Layers[layer_index].Name
+    return np.array([(pt.X, pt.Y, pt.Z) for pt in pts], dtype=np.float64).reshape(-1, 3)
 
-        if layer.startswith('COMMERC'):
-            n_bed = 0
-            n_beds.append(n_bed)
 
-        elif layer.startswith('RESID'):
-            n_bed = int(layer.split('_')[-1])
-            n_beds.append(n_bed)
+def get_street_points(model, objs, spacing=1.0):
+    '''Busy and local streets sampled every spacing metres along each street.
+
+    Each is a (points, lengths) pair: an (N, 3) array of points and the street
+    length in metres each point stands for.
+    '''
+    index = layer_index(model, objs)
+    streets = []
+
+    for suffix in ('BUSY', 'LOCAL'):
+        samples = [sample_polyline(curve_vertices(objs[i].Geometry, spacing), spacing, lengths=True)
+                   for i in index.with_suffix(suffix)]
+        if samples:
+            streets.append((np.concatenate([s[0] for s in samples]), np.concatenate([s[1] for s in samples])))
+        else:
+            streets.append((np.zeros((0, 3)), np.zeros(0)))
 
-        elif layer.startswith('SOCIAL'):
-            n_bed = 0
+    return streets[0], streets[1]
+
+
+
+def get_nbeds(model, objs):
+    n_beds = []
+    index = layer_index(model, objs)
+    for i in range(len(objs)):
+        n_bed = index.n_beds(i, usages=('COMMERC', 'RESID', 'SOCIAL'))
+        if n_bed is not None:
             n_beds.append(n_bed)
 
     return n_beds
@@ -150,12 +232,11 @@ def get_nbeds(model, objs):
 
 def get_usage_list(model, objs):
     usage_list = []
-    for obj in objs:
-        layer_index = obj.Attributes.LayerIndex
-        layer_name = model.Layers[layer_index].Name
+    index = layer_index(model, objs)
+    for layer_name in index.layer_names:
         layer_name = layer_name.split('_')[0]
 
-        if layer_name == 'COMMERC' or layer_name == 'RESID' or layer_name == 'SOCIAL' or layer_name == 'CORE':
+        if layer_name in USAGES:
             usage_list.append(layer_name)
 
     return usage_list
@@ -166,7 +247,7 @@ def get_green_points(green_breps, dist):
     centroids = []
 
     for br in green_breps:
-        lb_face = to_face3d(br)[0]
+        lb_face = brep_faces(br)[0]
         lb_mesh_centroid = (lb_face.mesh_grid(x_dim = dist)).face_centroids
         centroids.append(lb_mesh_centroid)
 
@@ -205,10 +286,19 @@ def get_model_meshes(model):
 def get_balcony_area(rooms_geo, balconies_geo):
     b_areas = []
 
-    for r_geo in rooms_geo:
+    # only pairs whose bounding boxes touch can intersect
+    r_boxes = [r_geo.GetBoundingBox(True) for r_geo in rooms_geo]
+    b_boxes = [b_geo.GetBoundingBox(True) for b_geo in balconies_geo]
+    candidates = box_overlaps([(bb.Min.X, bb.Min.Y, bb.Min.Z) for bb in r_boxes],
+                              [(bb.Max.X, bb.Max.Y, bb.Max.Z) for bb in r_boxes],
+                              [(bb.Min.X, bb.Min.Y, bb.Min.Z) for bb in b_boxes],
+                              [(bb.Max.X, bb.Max.Y, bb.Max.Z) for bb in b_boxes], 0.001)
+
+    for r_geo, r_candidates in zip(rooms_geo, candidates):
         balcony_areas = []  
 
-        for b_geo in balconies_geo:
+        for j in np.flatnonzero(r_candidates):
+            b_geo = balconies_geo[j]
             rc, out_curves, out_points = Intersection.BrepBrep(r_geo, b_geo, 0.001)
 
             if out_curves and len(out_curves) > 0:
@@ -4,9 +4,16 @@ import os
 
 import json
 import pathlib
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 from ladybug.color import Color
+from ladybug_geometry.geometry3d.face import Face3D
+from honeybee.shade import Shade
 import honeybee_vtk
 from honeybee_vtk.scene import Scene
 from honeybee_vtk.camera import Camera
@@ -23,205 +30,243 @@ from streamlit_vtkjs import st_vtkjs
 
 
 
-def get_config(study_name, results_folder, unit, d_range, cs):
+Study = namedtuple('Study', ['name', 'color_set', 'data_range', 'unit'])
+
+
+STUDIES = MappingProxyType({study.name: study for study in (
+    Study('Horizontal_Views', 'view_study', (0, 50), '%'),
+    Study('Horizontal_Mean', 'heat_sensation', (0, 30), '% mean'),
+    Study('Outdoors_Views_Satisfaction', 'shade_benefit_harm', (0, 2), 'Satisfaction'),
+    Study('Sky_Views', 'view_study', (0, 50), '%'),
+    Study('Sky_Mean', 'cold_sensation', (0, 30), '% mean'),
+    Study('Sky_Views_Satisfaction', 'shade_benefit_harm', (0, 2), 'Satisfaction'),
+    Study('Green_Views', 'view_study', (0, 50), '%'),
+    Study('Green_Mean', 'peak_load_balance', (0, 20), '% mean'),
+    Study('Green_Views_Satisfaction', 'shade_benefit_harm', (0, 2), 'Satisfaction'),
+    Study('Balcony_Areas', 'shadow_study', (0, 15), 'Area m2'),
+    Study('Balcony_Percentage', 'shadow_study', (0, 15), '%'),
+    Study('Access_to_Green_Satisfaction', 'shade_benefit_harm', (0, 2), 'Satisfaction'),
+    Study('Areas', 'annual_comfort', (30, 120), 'Area m2'),
+    Study('Occupancy_Rate', 'energy_balance', (0.016, 0.026), 'ppl/m2'),
+    Study('Space_Size_Satisfaction', 'shade_benefit_harm', (0, 2), 'Satisfaction'),
+    Study('Extreme_Hot_Week_Temp', 'nuanced', (24, 30), 'C'),
+    Study('Ext_Hot_Thermal_Sensation', 'thermal_comfort', (-2, 2), 'Cold / Warm'),
+    Study('Ext_Hot_Thermal_Satisfaction', 'shade_benefit_harm', (0, 2), 'Satisfaction'),
+    Study('Extreme_Cold_Week_Temp', 'nuanced', (15, 24), 'C'),
+    Study('Ext_Cold_Thermal_Sensation', 'thermal_comfort', (-2, 2), 'Cold / Warm'),
+    Study('Ext_Cold_Thermal_Satisfaction', 'shade_benefit_harm', (0, 2), 'Satisfaction'),
+    Study('Daylight_Autonomy', 'ecotect', (0, 100), 'DA %'),
+    Study('DA_mean', 'ecotect', (40, 80), '% mean'),
+    Study('Daylight_Satisfaction', 'shade_benefit_harm', (0, 1), 'Satisfaction'),
+    Study('Useful_Daylight_Illuminance', 'ecotect', (0, 100), 'UDI %'),
+    Study('UDI_mean', 'ecotect', (40, 80), '% mean'),
+    Study('Glare_Autonomy', 'glare_study', (0, 100), 'GA %'),
+    Study('GA_mean', 'glare_study', (40, 80), '% mean'),
+    Study('CO2_Levels', 'black_to_white', (400, 1000), 'ppm'),
+    Study('Relative_Humidity', 'cloud_cover', (40, 70), '%'),
+    Study('Air_Quality_Satisfaction', 'shade_benefit_harm', (0, 2), 'Satisfaction'),
+    Study('Delight_Satisfaction', 'benefit_harm', (0, 2), 'Satisfaction'),
+    Study('Sound_Levels', 'blue_green_red', (30, 50), 'dB'),
+    Study('Sound_Level_Satisfaction', 'shade_benefit_harm', (0, 1), 'Satisfaction'),
+    Study('Comfort_Satisfaction', 'benefit_harm', (0, 2), 'Satisfaction'),
+    Study('Social_Green_Areas', 'peak_load_balance', (100, 200), 'Area m2'),
+    Study('Social_Green_Area_Occupants', 'peak_load_balance', (0, 20), 'm2/occupant'),
+    Study('Social_green_satisfaction', 'shade_benefit_harm', (0, 2), 'Satisfaction'),
+    Study('Social_Total_Areas', 'shadow_study', (50, 500), 'm2/occupant'),
+    Study('Social_Area_Occupants', 'shadow_study', (0, 20), 'm2/occupant'),
+    Study('Social_Amount_Satisfaction', 'shade_benefit_harm', (0, 2), 'Satisfaction'),
+    Study('Social_Levels_Available', 'annual_comfort', (0, 4), 'Number of Social Levels Available'),
+    Study('Weighted_Distribution_Social_Spaces', 'annual_comfort', (0, 1), 'wdss'),
+    Study('Social_Distribution_Satisfaction', 'shade_benefit_harm', (0, 2), 'Satisfaction'),
+    Study('Social_Satisfaction', 'benefit_harm', (0, 2), 'Satisfaction'),
+    Study('Wellbeing_Fostered_by_Design', 'benefit_harm', (0, 6), 'Satisfaction'),
+)})
+
+
+def _config_template(study):
+    return MappingProxyType({
+        "identifier": study.name,
+        "object_type": "grid",
+        "unit": study.unit,
+        "hide": False,
+        "legend_parameters": MappingProxyType({
+                "hide_legend": False,
+                "min": study.data_range[0],
+                "max": study.data_range[1],
+                "color_set": study.color_set,
+                "label_parameters": MappingProxyType({
+                    "color": (0, 0, 0),
+                    "size": 0,
+                    "bold": True
+                })
+        })
+    })
+
+
+def _thaw(value):
+    '''Deep, plain dict/list copy of a frozen config template'''
+    if isinstance(value, (dict, MappingProxyType)):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_thaw(item) for item in value]
+    return value
+
+
+CONFIG_TEMPLATES = MappingProxyType({name: _config_template(study) for name, study in STUDIES.items()})
+
+
+def get_study(study_name):
+    '''Look up the colour set, data range and unit of a study'''
+    return STUDIES[study_name]
+
+
+def studies_with_unit(unit):
+    '''Names of every study reported in the given unit, e.g. "Satisfaction"'''
+    return [name for name, study in STUDIES.items() if study.unit == unit]
+
+
+
+def config_entry(study_name, results_folder):
+    '''Return the honeybee-vtk config data entry of one study'''
+    entry = _thaw(CONFIG_TEMPLATES[study_name])
+    entry["path"] = results_folder.as_posix()
+    return entry
+
+
+def get_config(study_name, results_folder):
+    '''Write the study config.json, leaving the file untouched when its content is unchanged'''
 
     cfg = {
-        "data": [
-            {
-                "identifier": study_name,
-                "object_type": "grid",
-                "unit": unit[study_name],
-                "path": results_folder.as_posix(),
-                "hide": False,
-                "legend_parameters": {
-                        "hide_legend": False,
-                        "min": d_range[study_name][0],
-                        "max": d_range[study_name][1],
-                        "color_set": cs[study_name],
-                        "label_parameters": {
-                            "color": [0, 0, 0],
-                            "size": 0,
-                            "bold": True
-                        }
-                }
-            }
-        ]
+        "data": [config_entry(study_name, results_folder)]
     }
 
-    
     config_file = results_folder.joinpath("config.json")
-    with open(config_file, "w") as f:
-        json.dump(cfg, f, indent=2)
+    write_config(config_file, cfg)
 
     return config_file
 
 
+def write_config(config_file, cfg):
+    content = json.dumps(cfg, indent=2)
+    if not config_file.exists() or config_file.read_text() != content:
+        config_file.write_text(content)
+
+
+
+
+_VTK_MODELS = OrderedDict()
+_VTK_MODELS_MAX = 4
+_VTK_LOCK = threading.RLock()
+
+
+def _vtk_entry(model):
+    '''Return the cache entry [hb model, model hash, VTKModel or None] for an HB model,
+    keeping only the _VTK_MODELS_MAX most recently used models'''
+    with _VTK_LOCK:
+        entry = _VTK_MODELS.get(model.identifier)
+        if entry is None or entry[0] is not model:
+            digest = hashlib.sha1(json.dumps(model.to_dict(), sort_keys=True).encode('utf-8')).hexdigest()
+            entry = [model, digest, None]
+            _VTK_MODELS[model.identifier] = entry
+        _VTK_MODELS.move_to_end(model.identifier)
+        while len(_VTK_MODELS) > _VTK_MODELS_MAX:
+            _VTK_MODELS.popitem(last=False)
+
+    return entry
+
+
+def get_vtk_model(model):
+    '''Build the study VTK model once per HB model and reuse it for every study column'''
+    entry = _vtk_entry(model)
+    if entry[2] is None:
+        vtk_model = VTKModel(model, SensorGridOptions.Mesh)
+        vtk_model.sensor_grids.display_mode = DisplayMode.SurfaceWithEdges
+        vtk_model.shades.display_mode = DisplayMode.Surface
+        vtk_model.shades.color = Color(130, 130, 130, 200)
+        vtk_model.walls.display_mode = DisplayMode.Wireframe
+        vtk_model.walls.color = Color(0, 0, 0, 255)
+        vtk_model.floors.display_mode = DisplayMode.Wireframe
+        vtk_model.floors.color = Color(0, 0, 0, 0)
+        vtk_model.roof_ceilings.display_mode = DisplayMode.Wireframe
+        vtk_model.roof_ceilings.color = Color(0, 0, 0, 0)
+        entry[2] = vtk_model
+
+    return entry[2]
+
+
+def clear_study_data(vtk_model):
+    '''Drop the result arrays of the previous study from the cached VTK model'''
+    fields = vtk_model.sensor_grids.fields_info
+    for data in vtk_model.sensor_grids.data:
+        for name in fields:
+            data.GetCellData().RemoveArray(name)
+            data.GetPointData().RemoveArray(name)
+    fields.clear()
+
+
+def study_hash(model, results_folders, config_file):
+    '''Hash the model, the result files of the study folders and the config'''
+    hasher = hashlib.sha1(_vtk_entry(model)[1].encode('utf-8'))
+    for folder in results_folders:
+        for path in sorted(folder.iterdir()):
+            if path.is_file() and path.suffix not in ('.vtkjs', '.hash') and path.name != 'config.json':
+                st = path.stat()
+                hasher.update(f'{path.as_posix()}_{st.st_size}_{st.st_mtime_ns}'.encode('utf-8'))
+    hasher.update(config_file.read_bytes())
+
+    return hasher.hexdigest()
 
 
 def color_vtkjs_from_results(model, results_folder, study_name):
-    
-    vtk_model = VTKModel(model, SensorGridOptions.Mesh)
-
-    cs = {'Horizontal_Views': 'view_study',
-          'Horizontal_Mean' : 'heat_sensation',
-          'Outdoors_Views_Satisfaction' : 'shade_benefit_harm',
-          'Sky_Views': 'view_study',
-          'Sky_Mean' : 'cold_sensation',
-          'Sky_Views_Satisfaction' : 'shade_benefit_harm',
-          'Green_Views': 'view_study',
-          'Green_Mean' : 'peak_load_balance',
-          'Green_Views_Satisfaction' : 'shade_benefit_harm',
-          "Balcony_Areas": 'shadow_study',
-          "Balcony_Percentage": 'shadow_study',
-          "Access_to_Green_Satisfaction": 'shade_benefit_harm',
-          "Areas": 'annual_comfort',
-          "Occupancy_Rate": 'energy_balance',
-          "Space_Size_Satisfaction" : 'shade_benefit_harm',
-          "Extreme_Hot_Week_Temp": "nuanced",
-          "Ext_Hot_Thermal_Sensation": "thermal_comfort",
-          "Ext_Hot_Thermal_Satisfaction" : 'shade_benefit_harm',
-          "Extreme_Cold_Week_Temp": 'nuanced',
-          "Ext_Cold_Thermal_Sensation": 'thermal_comfort',
-          "Ext_Cold_Thermal_Satisfaction": 'shade_benefit_harm',
-          "Daylight_Autonomy": "ecotect",
-          "DA_mean": 'ecotect',
-          "Daylight_Satisfaction": 'shade_benefit_harm',
-          "Useful_Daylight_Illuminance": "ecotect",
-          "UDI_mean": "ecotect",
-          "Glare_Autonomy": "glare_study",
-          "GA_mean": "glare_study",
-          "CO2_Levels": 'black_to_white',
-          "Relative_Humidity": 'cloud_cover',
-          "Air_Quality_Satisfaction": 'shade_benefit_harm',
-          "Delight_Satisfaction": 'benefit_harm',
-          "Sound_Levels": 'blue_green_red',
-          "Sound_Level_Satisfaction": 'shade_benefit_harm',
-          "Comfort_Satisfaction": 'benefit_harm',
-          "Social_Green_Areas": 'peak_load_balance',
-          "Social_Green_Area_Occupants": 'peak_load_balance',
-          "Social_green_satisfaction":'shade_benefit_harm',
-          "Social_Total_Areas": 'shadow_study',
-          "Social_Area_Occupants": 'shadow_study',
-          "Social_Amount_Satisfaction": 'shade_benefit_harm',
-          "Social_Levels_Available": 'annual_comfort',
-          "Weighted_Distribution_Social_Spaces": 'annual_comfort',
-          "Social_Distribution_Satisfaction": 'shade_benefit_harm',
-          "Social_Satisfaction": 'benefit_harm',
-          "Wellbeing_Fostered_by_Design": 'benefit_harm'}
+    '''Export the study as a coloured vtkjs, reusing the cached VTK model and skipping
+    the export when the model, results and config are unchanged since the last one'''
 
-    
-    d_range = {'Horizontal_Views': [0, 50],
-               'Horizontal_Mean' : [0, 30],
-               'Outdoors_Views_Satisfaction' : [0, 2],
-               'Sky_Views': [0, 50],
-               'Sky_Mean' : [0, 30],
-               'Sky_Views_Satisfaction' : [0, 2],
-               'Green_Views': [0, 50],
-               'Green_Mean' : [0, 20],
-               'Green_Views_Satisfaction' : [0, 2],
-                "Balcony_Areas": [0,15],
-                "Balcony_Percentage": [0,15],
-                "Access_to_Green_Satisfaction":[0, 2],
-                "Areas": [30,120],
-                "Occupancy_Rate": [0.016,0.026],
-                "Space_Size_Satisfaction":[0, 2],
-                "Extreme_Hot_Week_Temp": [24, 30],
-                "Ext_Hot_Thermal_Sensation": [-2,2],
-                "Ext_Hot_Thermal_Satisfaction" : [0, 2],
-                "Extreme_Cold_Week_Temp": [15, 24],
-                "Ext_Cold_Thermal_Sensation": [-2,2],
-                "Ext_Cold_Thermal_Satisfaction": [0, 2],
-                "Daylight_Autonomy": [0,100],
-                "DA_mean": [40,80],
-                "Daylight_Satisfaction": [0, 1],
-                "Useful_Daylight_Illuminance": [0,100],
-                "UDI_mean":[40,80],
-                "Glare_Autonomy": [0,100],
-                "GA_mean": [40,80],
-                "CO2_Levels": [400,1000],
-                "Relative_Humidity": [40,70],
-                "Air_Quality_Satisfaction":[0, 2],
-                "Delight_Satisfaction":[0,2],
-                "Sound_Levels": [30,50],
-                "Sound_Level_Satisfaction": [0,1],
-                "Comfort_Satisfaction":[0,2],
-                "Social_Green_Areas": [100,200],
-                "Social_Green_Area_Occupants": [0,20],
-                "Social_green_satisfaction":[0,2],
-                "Social_Total_Areas": [50,500],
-                "Social_Area_Occupants": [0,20],
-                "Social_Amount_Satisfaction":[0,2],
-                "Social_Levels_Available": [0,4],
-                "Weighted_Distribution_Social_Spaces": [0,1],
-                "Social_Distribution_Satisfaction":[0,2],
-                "Social_Satisfaction": [0,2],
-                "Wellbeing_Fostered_by_Design": [0,6]}
-    
-    
-    unit = {'Horizontal_Views': "%",
-            'Horizontal_Mean' : "% mean",
-            'Outdoors_Views_Satisfaction' : "Satisfaction", 
-            'Sky_Views': "%",
-            'Sky_Mean' : "% mean",
-            'Sky_Views_Satisfaction' : "Satisfaction", 
-            'Green_Views': "%",
-            'Green_Mean' : "% mean",
-            'Green_Views_Satisfaction' : "Satisfaction",
-            "Balcony_Areas": 'Area m2',
-            "Balcony_Percentage": '%',
-            "Access_to_Green_Satisfaction": "Satisfaction",
-            "Areas": 'Area m2',
-            "Occupancy_Rate": 'ppl/m2',
-            "Space_Size_Satisfaction" :"Satisfaction",
-            "Extreme_Hot_Week_Temp": "C",
-            "Ext_Hot_Thermal_Sensation": "Cold / Warm",
-            "Ext_Hot_Thermal_Satisfaction" : 'Satisfaction',
-            "Extreme_Cold_Week_Temp": "C",
-            "Ext_Cold_Thermal_Sensation": "Cold / Warm",
-            "Ext_Cold_Thermal_Satisfaction": 'Satisfaction',
-            "Daylight_Autonomy": "DA %",
-            "DA_mean": "% mean",
-            "Daylight_Satisfaction": 'Satisfaction',
-            "Useful_Daylight_Illuminance": "UDI %",
-            "UDI_mean": "% mean",
-            "Glare_Autonomy": "GA %",
-            "GA_mean": "% mean",
-            "CO2_Levels": 'ppm',
-            "Relative_Humidity": '%',
-            "Air_Quality_Satisfaction":'Satisfaction',
-            "Delight_Satisfaction": 'Satisfaction',
-            "Sound_Levels": 'dB',
-            "Sound_Level_Satisfaction":'Satisfaction',
-            "Comfort_Satisfaction":'Satisfaction',
-            "Social_Green_Areas": 'Area m2',
-            "Social_Green_Area_Occupants": 'm2/occupant',
-            "Social_green_satisfaction":'Satisfaction',
-            "Social_Total_Areas": 'm2/occupant',
-            "Social_Area_Occupants": 'm2/occupant',
-            "Social_Amount_Satisfaction":'Satisfaction',
-            "Social_Levels_Available": 'Number of Social Levels Available',
-            "Weighted_Distribution_Social_Spaces": 'wdss',
-            "Social_Distribution_Satisfaction": 'Satisfaction',
-            "Social_Satisfaction": 'Satisfaction',
-            "Wellbeing_Fostered_by_Design": 'Satisfaction'}
-    
-    
-    vtk_model.sensor_grids.display_mode = DisplayMode.SurfaceWithEdges
-    vtk_model.shades.display_mode = DisplayMode.Surface
-    vtk_model.shades.color = Color(130, 130, 130, 200)
-    vtk_model.walls.display_mode = DisplayMode.Wireframe
-    vtk_model.walls.color = Color(0, 0, 0, 255)
-    vtk_model.floors.display_mode = DisplayMode.Wireframe
-    vtk_model.floors.color = Color(0, 0, 0, 0)
-    vtk_model.roof_ceilings.display_mode = DisplayMode.Wireframe
-    vtk_model.roof_ceilings.color = Color(0, 0, 0, 0)
-
-
-    config_file = get_config(study_name, results_folder, unit, d_range, cs)
-
-    vtk_model.to_vtkjs(folder=results_folder,name=study_name, 
-                       config=config_file.as_posix(),
-                       model_display_mode=DisplayMode.Wireframe)
+    config_file = get_config(study_name, results_folder)
+
+    key = study_hash(model, [results_folder], config_file)
+    marker = results_folder.joinpath(f'{study_name}.hash')
+    if results_folder.joinpath(f'{study_name}.vtkjs').exists() and marker.exists() and marker.read_text() == key:
+        return
+
+    with _VTK_LOCK:
+        vtk_model = get_vtk_model(model)
+        clear_study_data(vtk_model)
+
+        vtk_model.to_vtkjs(folder=results_folder,name=study_name, 
+                           config=config_file.as_posix(),
+                           model_display_mode=DisplayMode.Wireframe)
+    marker.write_text(key)
+
+
+def color_vtkjs_all_studies(model, study_dics, study_names, output_folder, name='Wellbeing_Studies'):
+    '''Export one vtkjs holding the geometry once and every study as a named data layer.
+
+    study_dics maps each study name to its results folder, as in view_study.
+    Returns the path of the exported file.
+    '''
+    output_folder = pathlib.Path(output_folder)
+    output_folder.mkdir(parents=True, exist_ok=True)
+    cfg = {"data": [config_entry(study, pathlib.Path(study_dics[study])) for study in study_names]}
+
+    config_file = output_folder.joinpath(f"{name}_config.json")
+    write_config(config_file, cfg)
+
+    vtkjs_file = output_folder.joinpath(f'{name}.vtkjs')
+    key = study_hash(model, [pathlib.Path(study_dics[study]) for study in study_names], config_file)
+    marker = output_folder.joinpath(f'{name}.hash')
+    if vtkjs_file.exists() and marker.exists() and marker.read_text() == key:
+        return vtkjs_file
+
+    with _VTK_LOCK:
+        vtk_model = get_vtk_model(model)
+        clear_study_data(vtk_model)
+
+        vtk_model.to_vtkjs(folder=output_folder, name=name,
+                           config=config_file.as_posix(),
+                           model_display_mode=DisplayMode.Wireframe)
+    marker.write_text(key)
+
+    return vtkjs_file
     
 
     
@@ -243,22 +288,172 @@ def get_vtkjs(model, output_folder, name):
     model.to_hbjson(folder=output_folder, name = name)
 
 
+class VtkjsByteCache(object):
+    '''Bounded LRU cache of vtkjs file bytes keyed by path and modification time'''
+
+    def __init__(self, max_bytes=512 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def read(self, path):
+        path = pathlib.Path(path)
+        key = (path.resolve().as_posix(), path.stat().st_mtime_ns)
+
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+
+        data = path.read_bytes()
+
+        with self._lock:
+            self.misses += 1
+            for old in [k for k in self._items if k[0] == key[0]]:
+                self._size -= len(self._items.pop(old))
+            self._items[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes and len(self._items) > 1:
+                self._size -= len(self._items.popitem(last=False)[1])
+
+        return data
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'entries': len(self._items), 'bytes': self._size}
+
+
+@st.cache_resource
+def vtkjs_cache():
+    '''vtkjs byte cache shared by every session of the app'''
+    return VtkjsByteCache()
+
+
+def triangle_count(faces):
+    '''Number of triangles the faces export to'''
+    return sum(len(f.triangulated_mesh3d.faces) for f in faces)
+
+
+def simplify_context_shades(model, near_distance=100, far_distance=400, min_solid_angle=1e-4, tolerance=0.01):
+    '''Return a copy of model with its context shades reduced by distance from the rooms.
+
+    Shades closer than near_distance keep full detail. Further away, coplanar
+    shades are merged, and past far_distance shades covering less than
+    min_solid_angle (area / distance²) are dropped. Kept shades stay as they
+    are; only merged faces become new detached shades. Also returns the
+    triangle counts before and after. A model without rooms comes back as is.
+    '''
+    before = triangle_count([shade.geometry for shade in model.shades])
+    if not model.rooms:
+        return model, before, before
+
+    rooms_min = [min(getattr(r.min, a) for r in model.rooms) for a in 'xyz']
+    rooms_max = [max(getattr(r.max, a) for r in model.rooms) for a in 'xyz']
+
+    def distance(face):
+        c = [getattr(face.center, a) for a in 'xyz']
+        d = [max(rooms_min[i] - c[i], 0, c[i] - rooms_max[i]) for i in range(3)]
+        return sum(v * v for v in d) ** 0.5
+
+    kept = []
+    planes = {}
+    for shade in model.shades:
+        face = shade.geometry
+        dist = distance(face)
+        if dist < near_distance:
+            kept.append(shade)
+            continue
+        if dist > far_distance and face.area / dist ** 2 < min_solid_angle:
+            continue
+        n = face.normal
+        key = (round(n.x, 2), round(n.y, 2), round(n.z, 2), round(n.dot(face.plane.o) / tolerance))
+        planes.setdefault(key, []).append(shade)
+
+    merged = []
+    for shades in planes.values():
+        if len(shades) == 1:
+            kept.append(shades[0])
+            continue
+        faces = Face3D.join_coplanar_faces([shade.geometry for shade in shades], tolerance)
+        merged.extend(Shade(f'context_lod_{len(merged) + i}', f, is_detached=True) for i, f in enumerate(faces))
+
+    simple = model.duplicate()
+    simple.remove_shades()
+    simple.add_shades([shade.duplicate() for shade in kept] + merged)
+
+    after = triangle_count([shade.geometry for shade in kept + merged])
+
+    return simple, before, after
+
+
+def get_vtkjs_lod(model, output_folder, name, levels=((100, 400), (50, 200), (0, 100))):
+    '''Export one vtkjs per detail level as <name>_lod<k>.vtkjs, level 0 being the full model.
+
+    Every further level is a (near_distance, far_distance) pair for
+    simplify_context_shades. Returns the triangle counts of each level.
+    '''
+    full = triangle_count([shade.geometry for shade in model.shades])
+    report = [{'level': 0, 'triangles_before': full, 'triangles_after': full}]
+    lod_models = [model]
+
+    for k, (near_distance, far_distance) in enumerate(levels, start=1):
+        simple, before, after = simplify_context_shades(model, near_distance, far_distance)
+        lod_models.append(simple)
+        report.append({'level': k, 'triangles_before': before, 'triangles_after': after})
+
+    for k, lod_model in enumerate(lod_models):
+        get_vtkjs(lod_model, output_folder, f'{name}_lod{k}')
+
+    return report
+
+
 def get_views(name, output_folder, height):
 
     key = f'{name}_{0}'
-    read_folder = pathlib.Path('data', output_folder, f'{name}.vtkjs').read_bytes()
+    read_folder = vtkjs_cache().read(pathlib.Path('data', output_folder, f'{name}.vtkjs'))
     height = f'{height}px'
     views = st_vtkjs(content=read_folder, key=key,style={'height': height}, subscribe=False)
     return views
 
 
-def view_study(view_hb_model, study_dics, study_names, labels, v_height):
+def view_study(view_hb_model, study_dics, study_names, labels, v_height, lazy=False, workers=4):
+    '''Show one vtkjs view per study column. With lazy=True every column paints a
+    placeholder first, the exports run on a background thread pool and each
+    column fills in as soon as its own export finishes'''
+
+    if not lazy:
+        for n, column in enumerate(st.columns(len(study_names))):
+            color_vtkjs_from_results(view_hb_model, study_dics[study_names[n]], study_name=study_names[n])
+            with column:
+                st.success(labels[n])
+                get_views(study_names[n], study_dics[study_names[n]], v_height)
+        return
 
+    placeholders = []
     for n, column in enumerate(st.columns(len(study_names))):
-        color_vtkjs_from_results(view_hb_model, study_dics[study_names[n]], study_name=study_names[n])
         with column:
             st.success(labels[n])
-            get_views(study_names[n], study_dics[study_names[n]], v_height)
+            placeholder = st.empty()
+            placeholder.info('Preparing view...')
+            placeholders.append(placeholder)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(color_vtkjs_from_results, view_hb_model, study_dics[name], study_name=name): n
+                   for n, name in enumerate(study_names)}
+
+        for future in as_completed(futures):
+            n = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                placeholders[n].error(f'Could not render {labels[n]}: {e}')
+                continue
+            with placeholders[n].container():
+                get_views(study_names[n], study_dics[study_names[n]], v_height)
 
 
   